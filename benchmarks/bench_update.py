@@ -0,0 +1,167 @@
+"""
+Offline benchmarks of the avanza_stock sensor update path.
+
+Sensors are updated from recorded Avanza payloads in benchmarks/fixtures,
+no network access or running Home Assistant instance is needed, only the
+packages the integration depends on. Run from the repository root:
+
+    python benchmarks/bench_update.py > bench_output.txt
+"""
+
+import argparse
+import itertools
+import json
+import pathlib
+import sys
+import time
+import tracemalloc
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+FIXTURES = ROOT / "benchmarks" / "fixtures"
+sys.path.insert(0, str(ROOT))
+
+from custom_components.avanza_stock.const import (  # noqa: E402
+    MONITORED_CONDITIONS,
+    MONITORED_CONDITIONS_DEFAULT,
+)
+from custom_components.avanza_stock.currency import ConversionRate  # noqa: E402
+from custom_components.avanza_stock.portfolio import (  # noqa: E402
+    Holding,
+    compute_portfolio,
+)
+from custom_components.avanza_stock.sensor import AvanzaStockSensor  # noqa: E402
+
+SIZES = [1, 100, 1000, 10000]
+
+CONDITION_SETS = {
+    "default": MONITORED_CONDITIONS_DEFAULT,
+    "all": MONITORED_CONDITIONS,
+}
+
+# (fixture, orderbook id, conversion currency, invert, shares, purchase price)
+KINDS = [
+    ("stock.json", 5361, None, False, 100.0, 200.0),
+    ("etf.json", 742236, None, False, 50.0, 140.0),
+    ("us_stock.json", 238449, 19000, False, 10.0, 1900.0),
+    ("stock.json", 5361, 19000, True, None, None),
+    (None, 0, None, False, 1.0, 600.0),
+]
+
+
+class BenchmarkCoordinator:
+    """Stand-in for the coordinator holding the recorded snapshots."""
+
+    def __init__(self):
+        """Load the fixtures."""
+        self.data = {}
+        for fixture, stock, *_ in KINDS:
+            if fixture is not None:
+                self.data[stock] = load_fixture(fixture)
+        fx = load_fixture("fx.json")
+        rate = fx["quote"]["last"]
+        self.conversion_rates = {
+            (19000, False): ConversionRate(rate, "SEK", 0.0),
+            (19000, True): ConversionRate(1.0 / rate, "USD", 0.0),
+        }
+        self.last_changed = {}
+        self.stale_stocks = set()
+        self.updated_stocks = set(self.data)
+        self.updated_conversions = set(self.conversion_rates)
+
+
+def load_fixture(name):
+    """Return a recorded payload."""
+    return json.loads((FIXTURES / name).read_text(encoding="utf-8"))
+
+
+def create_sensors(coordinator, count, monitored_conditions):
+    """Create count sensors cycling through the payload kinds."""
+    sensors = []
+    for index, kind in zip(range(count), itertools.cycle(KINDS)):
+        _, stock, conversion, invert, shares, purchase_price = kind
+        sensors.append(
+            AvanzaStockSensor(
+                None,
+                stock,
+                f"Benchmark {index}",
+                shares,
+                None,
+                purchase_price,
+                conversion,
+                invert,
+                "SEK" if stock == 0 else None,
+                monitored_conditions,
+                coordinator,
+                False,
+                None,
+                None,
+            )
+        )
+    return sensors
+
+
+def create_holdings(count):
+    """Create count holdings cycling through the payload kinds."""
+    holdings = []
+    for index, kind in zip(range(count), itertools.cycle(KINDS)):
+        _, stock, conversion, invert, shares, purchase_price = kind
+        holdings.append(
+            Holding(
+                f"Benchmark {index}",
+                stock,
+                shares or 1.0,
+                purchase_price,
+                (conversion, invert),
+                "SEK" if stock == 0 else None,
+            )
+        )
+    return holdings
+
+
+def measure(run, count, rounds):
+    """Return CPU microseconds and allocated bytes per item of run()."""
+    run()
+    start = time.process_time()
+    for _ in range(rounds):
+        run()
+    cpu = (time.process_time() - start) / rounds / count * 1e6
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak / count
+
+
+def main():
+    """Run the benchmarks and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    coordinator = BenchmarkCoordinator()
+    print(f"{'benchmark':<28} {'sensors':>8} {'cpu us/item':>12} {'peak B/item':>12}")
+    for conditions, size in itertools.product(CONDITION_SETS, args.sizes):
+        sensors = create_sensors(coordinator, size, CONDITION_SETS[conditions])
+
+        def update(sensors=sensors):
+            for sensor in sensors:
+                sensor._update_from_coordinator()
+
+        cpu, memory = measure(update, size, args.rounds)
+        name = f"update[{conditions}]"
+        print(f"{name:<28} {size:>8} {cpu:>12.2f} {memory:>12.0f}")
+
+    for size in args.sizes:
+        holdings = create_holdings(size)
+
+        def portfolio(holdings=holdings):
+            compute_portfolio(holdings, coordinator.data, coordinator.conversion_rates)
+
+        cpu, memory = measure(portfolio, size, args.rounds)
+        print(f"{'portfolio':<28} {size:>8} {cpu:>12.2f} {memory:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
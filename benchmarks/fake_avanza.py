@@ -0,0 +1,261 @@
+"""
+Local stand-in for the Avanza API.
+
+Serves the recorded payloads in benchmarks/fixtures for any orderbook id on
+the endpoints used by pyavanza, with configurable latency, jitter, error
+rate and rate limiting. It counts the requests it serves, the bytes sent and
+the peak number of requests in flight. A Bayeux push channel at
+/_push/cometd streams random walk quotes for every subscribed orderbook id.
+Run standalone with:
+
+    python benchmarks/fake_avanza.py --port 8080 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import pathlib
+import random
+import time
+import uuid
+
+from aiohttp import WSMsgType, web
+
+FIXTURES = pathlib.Path(__file__).resolve().parent / "fixtures"
+
+
+def load_fixture(name):
+    """Return a recorded payload."""
+    return json.loads((FIXTURES / name).read_text(encoding="utf-8"))
+
+
+class FakeAvanza:
+    """Serve recorded payloads like the Avanza API does."""
+
+    def __init__(
+        self,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        rate_limit_rate=0.0,
+        etf_ids=(),
+        currency_ids=(),
+        country_code=None,
+        push_interval=1.0,
+    ):
+        """Initialize the server, country_code overrides the listing."""
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.etf_ids = set(etf_ids)
+        self.currency_ids = set(currency_ids)
+        self.requests = 0
+        self.bytes_sent = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.push_interval = push_interval
+        self.pushed = 0
+        self._payloads = {
+            "stock": load_fixture("stock.json"),
+            "etf": load_fixture("etf.json"),
+            "currency": load_fixture("fx.json"),
+        }
+        if country_code is not None:
+            for payload in self._payloads.values():
+                payload["listing"]["countryCode"] = country_code
+        self._runner = None
+
+    def reset(self):
+        """Reset the counters."""
+        self.requests = self.bytes_sent = 0
+        self.errors = self.rate_limited = self.pushed = 0
+        self.peak_in_flight = self.in_flight
+
+    def _payload(self, kind, orderbook_id):
+        payload = copy.deepcopy(self._payloads[kind])
+        payload["orderbookId"] = str(orderbook_id)
+        return payload
+
+    async def _respond(self, kind, orderbook_id):
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            delay = self.latency + random.uniform(0, self.jitter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if random.random() < self.rate_limit_rate:
+                self.rate_limited += 1
+                return web.Response(status=429, text="Too Many Requests")
+            if random.random() < self.error_rate:
+                self.errors += 1
+                return web.Response(status=500, text="Internal Server Error")
+            return web.json_response(self._payload(kind, orderbook_id))
+        finally:
+            self.in_flight -= 1
+
+    async def _handle_stock(self, request):
+        orderbook_id = int(request.match_info["orderbook_id"])
+        if orderbook_id in self.currency_ids:
+            kind = "currency"
+        else:
+            kind = "stock"
+        response = await self._respond(kind, orderbook_id)
+        if orderbook_id in self.etf_ids and response.status == 200:
+            # The stock endpoint only tells the type of an ETF
+            payload = json.loads(response.body)
+            payload["type"] = "EXCHANGE_TRADED_FUND"
+            response = web.json_response(payload)
+        return response
+
+    async def _handle_quote(self, request):
+        orderbook_id = int(request.match_info["orderbook_id"])
+        if orderbook_id in self.etf_ids:
+            self.requests += 1
+            return web.Response(status=404, text="Not Found")
+        kind = "currency" if orderbook_id in self.currency_ids else "stock"
+        response = await self._respond(kind, orderbook_id)
+        if response.status == 200:
+            response = web.json_response(json.loads(response.body)["quote"])
+        return response
+
+    async def _handle_etf(self, request):
+        orderbook_id = int(request.match_info["orderbook_id"])
+        return await self._respond("etf", orderbook_id)
+
+    async def _handle_chart(self, request):
+        orderbook_id = int(request.match_info["orderbook_id"])
+        response = await self._respond("stock", orderbook_id)
+        if response.status != 200:
+            return response
+        # One close price per day for five years up to the last trade
+        last = self._payloads["stock"]["quote"]
+        day = 24 * 60 * 60 * 1000
+        ohlc = [
+            {"timestamp": last["timeOfLast"] - age * day, "close": last["last"]}
+            for age in range(5 * 365, 0, -1)
+        ]
+        return web.json_response({"ohlc": ohlc})
+
+    async def _handle_push(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        client_id = uuid.uuid4().hex
+        prices = {}
+        pending = []
+        ticker = None
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                break
+            replies = []
+            for message in json.loads(msg.data):
+                channel = message["channel"]
+                reply = {
+                    "channel": channel,
+                    "id": message.get("id"),
+                    "successful": True,
+                }
+                if channel == "/meta/handshake":
+                    reply["clientId"] = client_id
+                    reply["version"] = "1.0"
+                    reply["supportedConnectionTypes"] = ["websocket"]
+                elif channel == "/meta/subscribe":
+                    reply["subscription"] = message["subscription"]
+                    orderbook_id = int(message["subscription"].rsplit("/", 1)[1])
+                    last = self._payloads["stock"]["quote"]["last"]
+                    prices[orderbook_id] = [last, last]
+                elif channel == "/meta/connect":
+                    # Held until the next batch of quotes, like a long poll
+                    pending.append(reply)
+                    continue
+                replies.append(reply)
+            if replies:
+                await ws.send_json(replies)
+            if ticker is None and pending:
+                ticker = asyncio.create_task(self._async_push(ws, prices, pending))
+        if ticker is not None:
+            ticker.cancel()
+        return ws
+
+    async def _async_push(self, ws, prices, pending):
+        """Send random walk quotes of the subscribed ids every push interval."""
+        while not ws.closed:
+            await asyncio.sleep(self.push_interval)
+            messages = []
+            updated = int(time.time() * 1000)
+            for orderbook_id, price in prices.items():
+                price[0] = round(price[0] * random.uniform(0.995, 1.005), 2)
+                change = price[0] - price[1]
+                messages.append(
+                    {
+                        "channel": f"/quotes/{orderbook_id}",
+                        "data": {
+                            "orderbookId": orderbook_id,
+                            "lastPrice": price[0],
+                            "change": round(change, 2),
+                            "changePercent": round(100 * change / price[1], 2),
+                            "lastUpdated": updated,
+                        },
+                    }
+                )
+            messages += pending
+            pending.clear()
+            self.pushed += len(prices)
+            await ws.send_json(messages)
+
+    @web.middleware
+    async def _count_bytes(self, request, handler):
+        response = await handler(request)
+        if isinstance(response, web.Response) and response.body is not None:
+            self.bytes_sent += len(response.body)
+        return response
+
+    def create_app(self):
+        """Return the aiohttp application."""
+        app = web.Application(middlewares=[self._count_bytes])
+        app.router.add_get(
+            "/_api/market-guide/stock/{orderbook_id}", self._handle_stock
+        )
+        app.router.add_get(
+            "/_api/market-guide/stock/{orderbook_id}/quote", self._handle_quote
+        )
+        app.router.add_get("/_api/market-etf/{orderbook_id}", self._handle_etf)
+        app.router.add_get("/_api/price-chart/stock/{orderbook_id}", self._handle_chart)
+        app.router.add_get("/_push/cometd", self._handle_push)
+        return app
+
+    async def async_start(self, host="127.0.0.1", port=0):
+        """Start serving and return the base url of the api."""
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}/_api"
+
+    async def async_stop(self):
+        """Stop serving."""
+        await self._runner.cleanup()
+
+
+def main():
+    """Serve the fake api until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeAvanza(args.latency, args.jitter, args.error_rate, args.rate_limit_rate)
+    web.run_app(fake.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
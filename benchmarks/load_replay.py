@@ -0,0 +1,184 @@
+"""
+Load replay of the avanza_stock platform against a local Avanza stand-in.
+
+Starts the server in benchmarks/fake_avanza.py, points pyavanza at it and
+sets up the sensor platform in a bare Home Assistant instance with
+thousands of configured stocks. Reports the requests issued, the kilobytes
+received, the peak number of requests in flight, the startup time and the
+time of update cycles, which only fetch the quotes unless --full is given.
+With --history the price history is recorded and backfilled, with --push
+the quotes are streamed from the push channel of the stand-in and with
+--requests-per-hour the platform has a request budget. Run from the
+repository root:
+
+    python benchmarks/load_replay.py --stocks 2000 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import logging
+import pathlib
+import sys
+import tempfile
+import time
+
+import pyavanza
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.entity import async_setup as async_setup_entity
+from homeassistant.helpers.entity_platform import EntityPlatform
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.fake_avanza import FakeAvanza  # noqa: E402
+from custom_components.avanza_stock.const import DOMAIN  # noqa: E402
+from custom_components.avanza_stock.sensor import (  # noqa: E402
+    PLATFORM_SCHEMA,
+    SCAN_INTERVAL,
+    async_setup_platform,
+)
+
+FIRST_ID = 100000
+CONVERSION_CURRENCY = 19000
+
+
+def create_config(args, base_url):
+    """Return a platform config tracking args.stocks stocks."""
+    stocks = []
+    for index in range(args.stocks):
+        stock = {"id": FIRST_ID + index}
+        if index % 4 == 0:
+            stock["shares"] = 10
+            stock["purchase_price"] = 100
+        if index % 10 == 0:
+            stock["conversion_currency"] = CONVERSION_CURRENCY
+        stocks.append(stock)
+    config = {
+        "platform": DOMAIN,
+        "stock": stocks,
+        "portfolio": "Load replay",
+        "max_concurrent_requests": args.max_concurrent_requests,
+        "requests_per_second": args.requests_per_second,
+    }
+    if args.requests_per_hour is not None:
+        config["requests_per_hour"] = args.requests_per_hour
+    if args.history:
+        config["history"] = True
+    if args.push:
+        config["push_url"] = base_url.replace("/_api", "/_push/cometd")
+    return PLATFORM_SCHEMA(config)
+
+
+def report(name, fake, elapsed):
+    """Print the counters of the server for a phase."""
+    print(
+        f"{name:<12} {elapsed:>10.3f} {fake.requests:>10} {fake.bytes_sent // 1024:>8}"
+        f" {fake.peak_in_flight:>8} {fake.errors:>8} {fake.rate_limited:>8}"
+    )
+
+
+async def async_replay(args, config_dir):
+    """Set up the platform against the stand-in and run update cycles."""
+    fake = FakeAvanza(
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.rate_limit_rate,
+        etf_ids=range(FIRST_ID, FIRST_ID + args.stocks, 5),
+        currency_ids=[CONVERSION_CURRENCY],
+        country_code="XX",
+        push_interval=args.push_interval,
+    )
+    base_url = await fake.async_start()
+    pyavanza.AVANZA_API_ENDPOINT = base_url
+    pyavanza.AVANZA_API_STOCK_URL = base_url + "/market-guide/stock/{orderbook_id}"
+    pyavanza.AVANZA_API_ETF_URL = base_url + "/market-etf/{orderbook_id}"
+
+    hass = HomeAssistant(config_dir)
+    await hass.async_start()
+    async_setup_entity(hass)
+    await dr.async_load(hass)
+    await er.async_load(hass)
+    platform = EntityPlatform(
+        hass=hass,
+        logger=logging.getLogger(__name__),
+        domain="sensor",
+        platform_name=DOMAIN,
+        platform=None,
+        scan_interval=SCAN_INTERVAL,
+        entity_namespace=None,
+    )
+    entities = []
+
+    print(
+        f"{'phase':<12} {'seconds':>10} {'requests':>10} {'kB':>8} {'peak':>8}"
+        f" {'errors':>8} {'429':>8}"
+    )
+    start = time.perf_counter()
+    await async_setup_platform(hass, create_config(args, base_url), entities.extend)
+    await platform.async_add_entities(entities)
+    report("setup", fake, time.perf_counter() - start)
+
+    coordinator = entities[0].coordinator
+    start = time.perf_counter()
+    await hass.async_block_till_done()
+    report("startup", fake, time.perf_counter() - start)
+
+    for cycle in range(args.cycles):
+        fake.reset()
+        # Make every id due as if a full update interval had passed
+        coordinator._next_update.clear()
+        if args.full:
+            coordinator._next_full_update.clear()
+        start = time.perf_counter()
+        await coordinator.async_refresh()
+        await hass.async_block_till_done()
+        report(f"cycle {cycle + 1}", fake, time.perf_counter() - start)
+
+    if args.push:
+        fake.reset()
+        writes = 0
+
+        def count_write(event):
+            nonlocal writes
+            writes += 1
+
+        unsub = hass.bus.async_listen(EVENT_STATE_CHANGED, count_write)
+        await asyncio.sleep(args.push_seconds)
+        unsub()
+        report("push", fake, args.push_seconds)
+        print(f"quotes pushed {fake.pushed}, states written {writes}")
+
+    await hass.async_stop()
+    await fake.async_stop()
+
+
+def main():
+    """Run the load replay and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stocks", type=int, default=2000)
+    parser.add_argument("--cycles", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrent-requests", type=int, default=10)
+    parser.add_argument("--requests-per-second", type=float, default=1000.0)
+    parser.add_argument("--requests-per-hour", type=int)
+    parser.add_argument("--full", action="store_true")
+    parser.add_argument("--history", action="store_true")
+    parser.add_argument("--push", action="store_true")
+    parser.add_argument("--push-interval", type=float, default=1.0)
+    parser.add_argument("--push-seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    with tempfile.TemporaryDirectory() as config_dir:
+        asyncio.run(async_replay(args, config_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Price and change alerts for avanza_stock."""
+
+from bisect import bisect_right, insort
+
+from custom_components.avanza_stock.const import DATA_ALERTS, DOMAIN
+
+
+def get_alert_registry(hass):
+    """Return the integration-wide alert registry."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_ALERTS not in domain_data:
+        domain_data[DATA_ALERTS] = AlertRegistry()
+    return domain_data[DATA_ALERTS]
+
+
+class AlertRegistry:
+    """Keep alert thresholds per orderbook id and metric.
+
+    The thresholds of an id and metric are kept sorted, so the thresholds
+    crossed by a new value are found by bisecting at the previous and the
+    new value, whatever the number of thresholds.
+    """
+
+    def __init__(self):
+        """Initialize the registry."""
+        self._thresholds = {}
+        self._values = {}
+
+    def add(self, stock, metric, threshold):
+        """Add a threshold, adding it more than once has no effect."""
+        thresholds = self._thresholds.setdefault((stock, metric), [])
+        index = bisect_right(thresholds, threshold)
+        if not index or thresholds[index - 1] != threshold:
+            insort(thresholds, threshold)
+
+    def check(self, stock, metric, value):
+        """Return the (threshold, direction) pairs crossed since the last value.
+
+        A threshold is crossed up when the previous value was below it and
+        the new one is not, and down the other way around. Nothing is
+        crossed by the first value.
+        """
+        key = (stock, metric)
+        thresholds = self._thresholds.get(key)
+        if not thresholds:
+            return []
+        previous = self._values.get(key)
+        self._values[key] = value
+        if previous is None or value == previous:
+            return []
+        if value > previous:
+            low = bisect_right(thresholds, previous)
+            high = bisect_right(thresholds, value)
+            return [(threshold, "up") for threshold in thresholds[low:high]]
+        low = bisect_right(thresholds, value)
+        high = bisect_right(thresholds, previous)
+        return [(threshold, "down") for threshold in reversed(thresholds[low:high])]
@@ -0,0 +1,162 @@
+"""Attribute extraction plans for avanza_stock sensors.
+
+A plan is compiled once per sensor from its monitored conditions. It is a
+flat tuple of (attribute, extract, is_currency) entries where extract is
+called with the fetched data, the last price and the historical closing
+prices and returns the attribute value, or SKIP to leave it unset.
+"""
+
+from custom_components.avanza_stock.const import (
+    CHANGE_PERCENT_PRICE_MAPPING,
+    CHANGE_PRICE_MAPPING,
+    CURRENCY_ATTRIBUTE,
+    MONITORED_CONDITIONS_COMPANY,
+    MONITORED_CONDITIONS_DIVIDENDS,
+    MONITORED_CONDITIONS_KEYRATIOS,
+    MONITORED_CONDITIONS_LISTING,
+    MONITORED_CONDITIONS_PRICE,
+    MONITORED_CONDITIONS_QUOTE,
+    PRICE_MAPPING,
+    TOTAL_CHANGE_PRICE_MAPPING,
+)
+
+SKIP = object()
+
+LISTING_MAPPING = {
+    "marketPlace": "marketPlaceName",
+    "flagCode": "countryCode",
+}
+
+
+def _section(section, key):
+    def extract(data, last, prices):
+        return (data.get(section) or {}).get(key)
+
+    return extract
+
+
+def _top_level(key):
+    def extract(data, last, prices):
+        return data.get(key)
+
+    return extract
+
+
+def _price(key):
+    def extract(data, last, prices):
+        return prices.get(key)
+
+    return extract
+
+
+def _dividend(key):
+    def extract(data, last, prices):
+        dividend = (data.get("keyIndicators") or {}).get("dividend")
+        if dividend is None or key not in dividend:
+            return SKIP
+        return dividend[key]
+
+    return extract
+
+
+def _change(key):
+    def extract(data, last, prices):
+        if key not in prices:
+            return "unknown"
+        return round(last - prices[key], 5)
+
+    return extract
+
+
+def _total_change(key, shares):
+    def extract(data, last, prices):
+        if key not in prices:
+            return "unknown"
+        return round(shares * (last - prices[key]), 5)
+
+    return extract
+
+
+def _change_percent(key):
+    def extract(data, last, prices):
+        if key not in prices:
+            return "unknown"
+        return round(100 * (last - prices[key]) / prices[key], 3)
+
+    return extract
+
+
+def _shares(shares):
+    def extract(data, last, prices):
+        return shares
+
+    return extract
+
+
+def _total_value(shares):
+    def extract(data, last, prices):
+        return round(shares * last, 5)
+
+    return extract
+
+
+def _total_daily_change(shares):
+    def extract(data, last, prices):
+        return round(shares * data["quote"]["change"], 5)
+
+    return extract
+
+
+def _condition_entries(condition, shares):
+    """Return the (attribute, extract) pairs of a monitored condition."""
+    if condition in MONITORED_CONDITIONS_KEYRATIOS:
+        entries = [(condition, _section("keyRatios", condition))]
+    elif condition in MONITORED_CONDITIONS_COMPANY:
+        entries = [(condition, _section("company", condition))]
+    elif condition in MONITORED_CONDITIONS_QUOTE:
+        entries = [(condition, _section("quote", condition))]
+    elif condition in MONITORED_CONDITIONS_LISTING:
+        key = LISTING_MAPPING.get(condition, condition)
+        entries = [(condition, _section("listing", key))]
+    elif condition in MONITORED_CONDITIONS_PRICE:
+        entries = [(condition, _price(PRICE_MAPPING[condition]))]
+    elif condition == "dividends":
+        entries = [
+            (f"dividend_{key}", _dividend(key))
+            for key in MONITORED_CONDITIONS_DIVIDENDS
+        ]
+    elif condition == "id":
+        entries = [(condition, _top_level("orderbookId"))]
+    else:
+        entries = [(condition, _top_level(condition))]
+
+    if condition == "change":
+        entries += [(change, _change(price)) for change, price in CHANGE_PRICE_MAPPING]
+        if shares is not None:
+            entries += [
+                (change, _total_change(price, shares))
+                for change, price in TOTAL_CHANGE_PRICE_MAPPING
+            ]
+    if condition == "changePercent":
+        entries += [
+            (change, _change_percent(price))
+            for change, price in CHANGE_PERCENT_PRICE_MAPPING
+        ]
+    return entries
+
+
+def compile_attribute_plan(monitored_conditions, shares):
+    """Compile the attribute extraction plan of a sensor."""
+    entries = []
+    for condition in monitored_conditions:
+        entries += _condition_entries(condition, shares)
+    if shares is not None:
+        entries += [
+            ("shares", _shares(shares)),
+            ("totalValue", _total_value(shares)),
+            ("totalChange", _total_daily_change(shares)),
+        ]
+    return tuple(
+        (attribute, extract, attribute in CURRENCY_ATTRIBUTE)
+        for attribute, extract in entries
+    )
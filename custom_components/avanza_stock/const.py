@@ -1,5 +1,9 @@
 """Constants for avanza_stock."""
 
+from datetime import timedelta
+
+DOMAIN = "avanza_stock"
+
 DEFAULT_NAME = "Avanza Stock"
 
 CONF_STOCK = "stock"
@@ -7,14 +11,75 @@ CONF_SHARES = "shares"
 CONF_PURCHASE_DATE = "purchase_date"
 CONF_PURCHASE_PRICE = "purchase_price"
 CONF_CONVERSION_CURRENCY = "conversion_currency"
+CONF_CONVERSION_CURRENCIES = "conversion_currencies"
+CONF_CONVERT_TO = "convert_to"
 CONF_INVERT_CONVERSION_CURRENCY = "invert_conversion_currency"
 CONF_SHOW_TRENDING_ICON = "show_trending_icon"
+CONF_CONVERSION_CURRENCY_TTL = "conversion_currency_ttl"
+CONF_MAX_CONCURRENT_REQUESTS = "max_concurrent_requests"
+CONF_REQUESTS_PER_SECOND = "requests_per_second"
+CONF_REQUESTS_PER_HOUR = "requests_per_hour"
+CONF_MARKET_OPEN_INTERVAL = "market_open_interval"
+CONF_MIN_PRICE_CHANGE = "min_price_change"
+CONF_MIN_CHANGE_PERCENT = "min_change_percent"
+CONF_PORTFOLIO = "portfolio"
+CONF_TELEMETRY = "telemetry"
+CONF_RETRIES = "retries"
+CONF_CIRCUIT_BREAKER_THRESHOLD = "circuit_breaker_threshold"
+CONF_CIRCUIT_BREAKER_COOL_DOWN = "circuit_breaker_cool_down"
+CONF_PUSH_URL = "push_url"
+CONF_HISTORY = "history"
+CONF_INDICATORS = "indicators"
+CONF_RECORDED_ATTRIBUTES = "recorded_attributes"
+CONF_METRIC_SENSORS = "metric_sensors"
+CONF_ALERTS = "alerts"
+CONF_PRICE = "price"
+CONF_CHANGE_PERCENT = "change_percent"
+CONF_SMA = "sma"
+CONF_EMA = "ema"
+CONF_RSI = "rsi"
+CONF_VOLATILITY = "volatility"
+CONF_DRAWDOWN = "drawdown"
+
+# Keys for data shared in hass.data[DOMAIN]
+DATA_CONVERSION_CACHE = "conversion_cache"
+DATA_STORAGE = "storage"
+DATA_HISTORY = "history"
+DATA_SESSION = "session"
+DATA_COORDINATORS = "coordinators"
+DATA_ALERTS = "alerts"
+DATA_BUDGET = "budget"
+DATA_LIMITER = "limiter"
+DATA_TELEMETRY = "telemetry"
+DATA_TELEMETRY_SENSORS = "telemetry_sensors"
+DATA_PUSH = "push"
+
+SERVICE_IMPORT_STATISTICS = "import_statistics"
+SERVICE_GET_HISTORY = "get_history"
+EVENT_ALERT = "avanza_stock_alert"
+ATTR_IDS = "ids"
+ATTR_START = "start"
+ATTR_END = "end"
 
 # Attribute keys for extra state attributes
 ATTR_TRENDING = "trending"
+ATTR_STALE = "stale"
+ATTR_LAST_CHANGED = "last_changed"
 
 # Default configuration values
 DEFAULT_SHOW_TRENDING_ICON = False
+DEFAULT_CONVERSION_CURRENCY_TTL = timedelta(minutes=60)
+DEFAULT_MAX_CONCURRENT_REQUESTS = 10
+DEFAULT_REQUESTS_PER_SECOND = 5.0
+DEFAULT_MARKET_OPEN_INTERVAL = timedelta(minutes=15)
+DEFAULT_TELEMETRY = False
+DEFAULT_HISTORY = False
+DEFAULT_RETRIES = 2
+DEFAULT_CIRCUIT_BREAKER_THRESHOLD = 5
+DEFAULT_CIRCUIT_BREAKER_COOL_DOWN = timedelta(minutes=5)
+
+# How often the coordinator checks for ids that are due for an update
+UPDATE_TICK = timedelta(minutes=1)
 
 MONITORED_CONDITIONS = [
     "country",
@@ -197,3 +262,55 @@ CURRENCY_ATTRIBUTE = [
     "profitLoss",
     "totalProfitLoss",
 ]
+
+# Attribute groups kept out of the recorder unless listed in
+# recorded_attributes, attributes not in any group are always recorded
+RECORDED_ATTRIBUTE_GROUPS = {
+    "company": MONITORED_CONDITIONS_COMPANY,
+    "dividends": [f"dividend_{key}" for key in MONITORED_CONDITIONS_DIVIDENDS],
+    "instrument": [
+        "country",
+        "currency",
+        "flagCode",
+        "hasInvestmentFees",
+        "id",
+        "isin",
+        "loanFactor",
+        "marketList",
+        "marketMakerExpected",
+        "marketPlace",
+        "morningStarFactSheetUrl",
+        "name",
+        "pushPermitted",
+        "shortSellable",
+        "superLoan",
+        "tickerSymbol",
+        "tradable",
+    ],
+    "key_ratios": MONITORED_CONDITIONS_KEYRATIOS,
+    "periods": [
+        attribute
+        for mapping in (
+            CHANGE_PRICE_MAPPING,
+            TOTAL_CHANGE_PRICE_MAPPING,
+            CHANGE_PERCENT_PRICE_MAPPING,
+        )
+        for attribute, _ in mapping
+    ]
+    + MONITORED_CONDITIONS_PRICE,
+    # The attributes depend on the configured indicators
+    "indicators": [],
+}
+DEFAULT_RECORDED_ATTRIBUTES = []
+
+# Attribute groups that can be split off into sensors of their own, with the
+# attributes to take the state of those sensors from, the first one present
+METRIC_SENSOR_STATES = {
+    "company": ["marketCapital", "totalNumberOfShares", "sector"],
+    "dividends": ["dividend_amount", "dividend_exDate"],
+    # The first of the configured indicators
+    "indicators": [],
+    "key_ratios": MONITORED_CONDITIONS_KEYRATIOS,
+    "periods": ["changePercentOneYear", "changeOneYear", "priceOneYearAgo"],
+}
+DEFAULT_METRIC_SENSORS = []
@@ -0,0 +1,726 @@
+"""Data update coordinator for avanza_stock."""
+
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+
+import aiohttp
+import pyavanza
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+from homeassistant.util.json import json_loads
+
+from custom_components.avanza_stock.const import (
+    CONF_CHANGE_PERCENT,
+    CONF_PRICE,
+    DOMAIN,
+    EVENT_ALERT,
+    UPDATE_TICK,
+)
+from custom_components.avanza_stock.currency import ConversionRate, CurrencyGraph
+from custom_components.avanza_stock.limiter import (
+    SECONDS_PER_HOUR,
+    BudgetExhaustedError,
+    CircuitBreaker,
+    CircuitOpenError,
+    allocate_rates,
+)
+from custom_components.avanza_stock.market import (
+    get_market,
+    is_market_open,
+    next_market_update,
+)
+from custom_components.avanza_stock.push import get_push_client
+from custom_components.avanza_stock.snapshot import (
+    covers_fields,
+    slim_section,
+    slim_snapshot,
+)
+from custom_components.avanza_stock.telemetry import (
+    FetchTelemetry,
+    get_fetch_telemetry,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30)
+CHART_URL = "/price-chart/stock/{orderbook_id}?timePeriod=five_years"
+QUOTE_URL = "/market-guide/stock/{orderbook_id}/quote"
+RETRY_BACKOFF = 1.0
+MAX_RETRY_BACKOFF = 60.0
+
+
+def _is_transient(error):
+    """Return True if a failed request is worth retrying."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, aiohttp.ClientError | TimeoutError)
+
+
+def _keep_newer_quote(data, current):
+    """Return data with the quote of current if that one is more recent.
+
+    Streamed quotes are real-time while fetched ones may be delayed.
+    """
+    updated = (data.get("quote") or {}).get("updated")
+    current_quote = (current or {}).get("quote") or {}
+    current_updated = current_quote.get("updated")
+    if (
+        updated is not None
+        and current_updated is not None
+        and current_updated > updated
+    ):
+        return {**data, "quote": current_quote}
+    return data
+
+
+def _history_point(data):
+    """Return the (timestamp, price) of the last trade in a snapshot."""
+    quote = data.get("quote") or {}
+    timestamp = quote.get("timeOfLast") or quote.get("updated")
+    price = quote.get("last")
+    if not isinstance(timestamp, int) or price is None:
+        return None
+    return timestamp, price
+
+
+def _retry_delay(error, attempt):
+    """Return the seconds to wait before retrying a failed request.
+
+    The delay doubles with every attempt and is jittered to spread retries
+    of requests that failed at the same time. A Retry-After header in
+    seconds takes precedence.
+    """
+    if isinstance(error, aiohttp.ClientResponseError) and error.headers:
+        retry_after = error.headers.get("Retry-After")
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_BACKOFF)
+    delay = min(RETRY_BACKOFF * 2**attempt, MAX_RETRY_BACKOFF)
+    return random.uniform(delay / 2, delay)
+
+
+class AvanzaStockCoordinator(DataUpdateCoordinator):
+    """Fetch each unique orderbook id once per update interval.
+
+    The coordinator ticks more often than the update interval and only
+    fetches the ids that are due, which spreads the requests over the
+    interval instead of sending all of them at once. Ids listed on a known
+    market are fetched every market open interval while the market is open,
+    once after close and not at all while it is closed. With a request
+    budget the interval of every id of an open market follows from its
+    share of the budget instead.
+    """
+
+    def __init__(
+        self,
+        hass,
+        session,
+        limiter,
+        storage,
+        stocks,
+        conversions,
+        conversion_cache,
+        conversion_ttl,
+        update_interval,
+        market_open_interval,
+        retries,
+        failure_threshold,
+        cool_down,
+        push_url,
+        history,
+        fields,
+        alerts,
+        budget,
+    ):
+        """Initialize the coordinator.
+
+        Only the keys in fields, as compiled by compile_snapshot_fields, are
+        kept of the fetched data. Alerts is the alert registry to check
+        updated stocks against, None if no alerts are configured. Budget is
+        the RequestBudget to poll within, None to poll every market open
+        interval.
+        """
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=DOMAIN,
+            update_interval=min(update_interval, market_open_interval, UPDATE_TICK),
+        )
+        self._session = session
+        self._limiter = limiter
+        self._interval = update_interval
+        self._market_open_interval = market_open_interval
+        self._markets = {}
+        self._next_update = {}
+        self._offsets = {}
+        self._next_full_update = {}
+        self._full_only = set()
+        self._storage = storage
+        self._stocks = frozenset(stock for stock in stocks if stock)
+        self._conversions = frozenset(
+            conversion for conversion in conversions if conversion[0]
+        )
+        self._conversion_cache = conversion_cache
+        self._conversion_ttl = conversion_ttl.total_seconds()
+        self._retries = retries
+        self._failure_threshold = failure_threshold
+        self._cool_down = cool_down
+        self._breakers = {}
+        self._history = history
+        self._backfilling = set()
+        self._fields = fields
+        self._alerts = alerts
+        self._budget = budget
+        self._budget_intervals = {}
+        self._budget_weights = {}
+        self._budget_warned = False
+        self._push = None
+        if push_url is not None:
+            self._push = get_push_client(hass, session, push_url)
+        self.conversion_rates = {}
+        self.currency_graph = CurrencyGraph(())
+        self.last_fetched = {}
+        self.last_changed = {}
+        self.stale_stocks = set()
+        self.updated_stocks = set()
+        self.updated_conversions = set()
+        # Shared with the other platforms that request the same ids
+        self.telemetry = get_fetch_telemetry(hass)
+
+    def restore(self):
+        """Restore the last stored snapshots without fetching anything.
+
+        Ids whose stored snapshot is still current according to their market
+        and kept all the fields of this platform are not fetched until their
+        next regular update, the others are marked stale until fetched again.
+        """
+        now = dt_util.utcnow()
+        data = {}
+        for stock in self._stocks:
+            snapshot, fetched, kept = self._storage.get_snapshot(stock)
+            if snapshot is None:
+                continue
+            data[stock] = snapshot = slim_snapshot(snapshot, self._fields)
+            self.last_fetched[stock] = self.last_changed[stock] = fetched
+            self._markets[stock] = market = get_market(snapshot)
+            # Stored by a platform that keeps fewer fields, fetch it in full
+            if market is not None and covers_fields(kept, self._fields):
+                self._next_update[stock] = next_market_update(
+                    market,
+                    fetched,
+                    self._market_open_interval,
+                    self._offset(stock, self._market_open_interval),
+                )
+        for conversion in self._conversions:
+            rate, unit, source = self._storage.get_conversion_rate(*conversion)
+            if rate is not None:
+                self.conversion_rates[conversion] = ConversionRate(
+                    rate, unit, float("-inf"), source
+                )
+        self.currency_graph = CurrencyGraph(self.conversion_rates.values())
+        self.data = data
+        self.stale_stocks = {
+            stock for stock in data if self._next_update.get(stock, now) <= now
+        }
+
+    def start_push(self):
+        """Start streaming quotes if a push url is configured."""
+        if self._push is None:
+            return
+        self._push.async_add_listener(
+            self._stocks,
+            self._async_handle_push_quotes,
+            self._async_handle_push_disconnect,
+        )
+        self._push.start(self.hass)
+
+    @callback
+    def _async_handle_push_quotes(self, quotes):
+        """Update the quotes of stocks from the push channel at once."""
+        now = dt_util.utcnow()
+        updated = set()
+        for stock, quote in quotes.items():
+            snapshot = (self.data or {}).get(stock)
+            if snapshot is None:
+                # Wait for the full snapshot of the first update
+                continue
+            current = snapshot.get("quote") or {}
+            merged = {**current, **slim_section(quote, self._fields["quote"])}
+            if merged == current:
+                continue
+            self.data[stock] = {**snapshot, "quote": merged}
+            self.last_fetched[stock] = self.last_changed[stock] = now
+            self.stale_stocks.discard(stock)
+            updated.add(stock)
+        if updated:
+            self._async_check_alerts(self.data, updated)
+            self.updated_stocks = updated
+            self.updated_conversions = set()
+            self.async_update_listeners()
+
+    @callback
+    def _async_handle_push_disconnect(self):
+        """Fall back to polling the stocks that were streamed."""
+        now = dt_util.utcnow()
+        for stock in self._stocks:
+            next_update = self._next_update.get(stock)
+            if next_update is not None:
+                self._next_update[stock] = min(
+                    next_update, now + self._market_open_interval
+                )
+
+    async def _async_update_data(self):
+        """Fetch the orderbook ids that are due and return all keyed by id."""
+        now = dt_util.utcnow()
+        if self._budget is not None:
+            self._allocate_budget(now)
+        stocks = [
+            stock for stock in self._stocks if self._next_update.get(stock, now) <= now
+        ]
+        if self._budget is not None:
+            available = self._budget.available
+            if len(stocks) > available:
+                # Fetch the ids that matter most, the others stay due
+                _LOGGER.debug(
+                    "Request budget used up, %d stocks not updated",
+                    len(stocks) - available,
+                )
+                stocks.sort(
+                    key=lambda stock: self._budget_weights.get(stock, math.inf),
+                    reverse=True,
+                )
+                stocks = stocks[:available]
+        current = self.data or {}
+        results = await asyncio.gather(
+            *(
+                self._async_fetch_due(stock, current.get(stock), now)
+                for stock in stocks
+            ),
+            return_exceptions=True,
+        )
+        data = dict(self.data or {})
+        updated = set()
+        paused = 0
+        for stock, result in zip(stocks, results):
+            if isinstance(result, Exception) or not result:
+                if isinstance(result, CircuitOpenError):
+                    # Leave it due so it is fetched once requests are allowed
+                    paused += 1
+                else:
+                    _LOGGER.warning("Failed to update %d: %s", stock, result)
+                    self._schedule_next_update(stock, now)
+                    # Try again after the cool-down rather than a full interval
+                    self._next_update[stock] = min(
+                        self._next_update[stock], now + self._cool_down
+                    )
+                if stock in data and stock not in self.stale_stocks:
+                    # Keep serving the last snapshot, marked stale
+                    self.stale_stocks.add(stock)
+                    updated.add(stock)
+                continue
+            if self._budget is not None and stock in data:
+                self._budget.observe(
+                    stock,
+                    (data[stock].get("quote") or {}).get("last"),
+                    (result.get("quote") or {}).get("last"),
+                    (now - self.last_fetched[stock]).total_seconds(),
+                )
+            self.last_fetched[stock] = now
+            result = slim_snapshot(result, self._fields)
+            result = _keep_newer_quote(result, data.get(stock))
+            if result != data.get(stock) or stock in self.stale_stocks:
+                data[stock] = result
+                self.last_changed[stock] = now
+                updated.add(stock)
+                self.stale_stocks.discard(stock)
+                self._storage.async_set_snapshot(stock, result, now, self._fields)
+            self._markets[stock] = get_market(result)
+            self._schedule_next_update(stock, now)
+        if paused:
+            _LOGGER.debug("Requests paused, %d stocks not updated", paused)
+        if self._history is not None and updated:
+            await self._async_record_history({stock: data[stock] for stock in updated})
+        self._async_check_alerts(data, updated)
+        if stocks and not data:
+            raise UpdateFailed("Failed to update any stock from Avanza")
+        updated_conversions = await self._async_update_conversion_rates()
+        # Quotes pushed while waiting went into the current data, keep them
+        current = self.data or {}
+        for stock, snapshot in data.items():
+            data[stock] = _keep_newer_quote(snapshot, current.get(stock))
+        # Set after the last await so a push update cannot replace them
+        self.updated_stocks = updated
+        self.updated_conversions = updated_conversions
+        return data
+
+    @callback
+    def _async_check_alerts(self, data, stocks):
+        """Fire an event for every alert threshold the stocks crossed."""
+        if self._alerts is None:
+            return
+        for stock in stocks:
+            quote = data[stock].get("quote") or {}
+            for metric, value in (
+                (CONF_PRICE, quote.get("last")),
+                (CONF_CHANGE_PERCENT, quote.get("changePercent")),
+            ):
+                if value is None:
+                    continue
+                for threshold, direction in self._alerts.check(stock, metric, value):
+                    self.hass.bus.async_fire(
+                        EVENT_ALERT,
+                        {
+                            "id": stock,
+                            "metric": metric,
+                            "threshold": threshold,
+                            "direction": direction,
+                            "value": value,
+                        },
+                    )
+
+    def _allocate_budget(self, now):
+        """Spread the request budget over the ids of open markets.
+
+        The budget is shared with the other platforms by number of ids. Ids
+        of a closed market are not polled and ids of an unknown market or
+        with streamed quotes are polled every update interval, their
+        requests and those of the conversion currencies are set aside first.
+        The rest is allocated by weight, each id polled at most every update
+        tick and at least every update interval.
+        """
+        data = self.data or {}
+        interval = max(self._interval, UPDATE_TICK).total_seconds()
+        reserved = (
+            len(self._conversions)
+            * SECONDS_PER_HOUR
+            / max(self._conversion_ttl, UPDATE_TICK.total_seconds())
+        )
+        polled = {}
+        for stock in self._stocks:
+            market = self._markets.get(stock)
+            if market is not None and not is_market_open(market, now):
+                continue
+            if (
+                stock not in data
+                or market is None
+                or (self._push is not None and stock in self._push.subscribed)
+            ):
+                reserved += SECONDS_PER_HOUR / interval
+                continue
+            polled[stock] = data[stock]
+        weights = {}
+        if polled:
+            weights = self._budget.weights(self._common_prices(polled))
+        self._budget_weights = weights
+        low = SECONDS_PER_HOUR / interval
+        share = self._budget.share(len(self._stocks))
+        budget = share - reserved
+        if len(polled) * low > budget and not self._budget_warned:
+            self._budget_warned = True
+            _LOGGER.warning(
+                "A request budget of %d per hour is too small to update %d stocks "
+                "every update interval",
+                share,
+                len(self._stocks),
+            )
+        rates = allocate_rates(
+            weights, budget, low, SECONDS_PER_HOUR / UPDATE_TICK.total_seconds()
+        )
+        self._budget_intervals = {}
+        for stock, rate in rates.items():
+            self._budget_intervals[stock] = timedelta(seconds=SECONDS_PER_HOUR / rate)
+            if stock not in self.stale_stocks:
+                self._next_update[stock] = (
+                    self.last_fetched[stock] + self._budget_intervals[stock]
+                )
+
+    def _common_prices(self, snapshots):
+        """Return the last prices converted to the most common currency.
+
+        Prices without a cross rate to that currency are left as they are.
+        """
+        currencies = Counter(
+            (snapshot.get("listing") or {}).get("currency")
+            for snapshot in snapshots.values()
+        )
+        currency = currencies.most_common(1)[0][0]
+        prices = {}
+        for stock, snapshot in snapshots.items():
+            price = (snapshot.get("quote") or {}).get("last") or 0
+            unit = (snapshot.get("listing") or {}).get("currency")
+            if unit and currency and unit != currency:
+                conversion_rate = self.currency_graph.get(unit, currency)
+                if conversion_rate is not None:
+                    price *= conversion_rate.rate
+            prices[stock] = price
+        return prices
+
+    def _offset(self, stock, interval):
+        """Return the offset of an id into its market schedule.
+
+        Every id keeps a random fraction of the interval, so the ids of a
+        market are not all fetched in the same tick.
+        """
+        fraction = self._offsets.get(stock)
+        if fraction is None:
+            fraction = self._offsets[stock] = random.random()
+        return interval * fraction
+
+    def _schedule_next_update(self, stock, now):
+        """Schedule the next update at the offset of the id.
+
+        Ids of an unknown market are updated every update interval, the
+        first time at a random offset into it.
+        """
+        market = self._markets.get(stock)
+        if self._push is not None and stock in self._push.subscribed:
+            # Quotes are streamed, poll only for the rest of the snapshot
+            open_interval = self._interval
+        else:
+            open_interval = self._budget_intervals.get(
+                stock, self._market_open_interval
+            )
+        if market is not None:
+            self._next_update[stock] = next_market_update(
+                market, now, open_interval, self._offset(stock, open_interval)
+            )
+        elif stock in self._next_update:
+            self._next_update[stock] = now + self._interval
+        else:
+            self._next_update[stock] = now + self._interval * random.random()
+
+    async def _async_update_conversion_rates(self):
+        """Update the conversion rates through the shared cache."""
+        conversions = list(self._conversions)
+        rates = await asyncio.gather(
+            *(
+                self._conversion_cache.async_get_rate(
+                    conversion_currency,
+                    invert,
+                    self._conversion_ttl,
+                    self._async_fetch_conversion,
+                )
+                for conversion_currency, invert in conversions
+            ),
+            return_exceptions=True,
+        )
+        updated = set()
+        for conversion, rate in zip(conversions, rates):
+            if isinstance(rate, Exception):
+                # Never lose the fetched stocks over a conversion currency
+                _LOGGER.warning(
+                    "Failed to update conversion currency %d: %s", conversion[0], rate
+                )
+                continue
+            if rate is not None and rate is not self.conversion_rates.get(conversion):
+                self.conversion_rates[conversion] = rate
+                self._storage.async_set_conversion_rate(
+                    *conversion, rate.rate, rate.unit, rate.source
+                )
+                updated.add(conversion)
+        if updated:
+            # Cross rates are derived once per update for all sensors
+            self.currency_graph = CurrencyGraph(self.conversion_rates.values())
+        return updated
+
+    async def _async_record_history(self, snapshots):
+        """Append the last trades to the history, backfilling it once.
+
+        An id whose backfill failed is tried again on its next update.
+        """
+        points = {}
+        for stock, snapshot in snapshots.items():
+            point = _history_point(snapshot)
+            if point is not None:
+                points[stock] = [point]
+        if not points:
+            return
+        missing = await self.hass.async_add_executor_job(self._history.append, points)
+        missing -= self._backfilling
+        if missing:
+            self._backfilling |= missing
+            self.hass.async_create_background_task(
+                self._async_backfill_history(missing), "avanza_stock history backfill"
+            )
+
+    async def async_fetch_chart(self, stock):
+        """Fetch the daily prices of the last five years of an orderbook id.
+
+        Return the ohlc points that have a timestamp and a closing price.
+        """
+        chart = await self._async_request(
+            "chart", pyavanza.AVANZA_API_ENDPOINT + CHART_URL, stock
+        )
+        return [
+            point
+            for point in chart.get("ohlc") or []
+            if point.get("timestamp") is not None and point.get("close") is not None
+        ]
+
+    async def _async_backfill_history(self, stocks):
+        """Backfill the history of orderbook ids from their price chart."""
+        stocks = list(stocks)
+        try:
+            charts = await asyncio.gather(
+                *(self.async_fetch_chart(stock) for stock in stocks),
+                return_exceptions=True,
+            )
+            for stock, chart in zip(stocks, charts):
+                if isinstance(chart, CircuitOpenError):
+                    _LOGGER.debug("Backfill of %d postponed: %s", stock, chart)
+                    continue
+                if isinstance(chart, Exception):
+                    _LOGGER.warning(
+                        "Failed to backfill history of %d: %s", stock, chart
+                    )
+                    continue
+                points = [(point["timestamp"], point["close"]) for point in chart]
+                await self.hass.async_add_executor_job(
+                    self._history.backfill, stock, points
+                )
+        finally:
+            self._backfilling.difference_update(stocks)
+
+    async def _async_fetch_due(self, stock, snapshot, now):
+        """Fetch the quote of an orderbook id, or all of it when that is due.
+
+        The quote is fetched from its own small endpoint and merged into the
+        last snapshot. The rest of the snapshot, the historical closing
+        prices, company, key ratios and dividends, only changes daily and is
+        fetched every update interval.
+        """
+        if (
+            snapshot is None
+            or stock in self._full_only
+            or self._next_full_update.get(stock, now) <= now
+        ):
+            data = await self._async_fetch(stock)
+            if data:
+                self._next_full_update[stock] = now + self._interval
+            return data
+        try:
+            quote = await self._async_request(
+                "quote", pyavanza.AVANZA_API_ENDPOINT + QUOTE_URL, stock
+            )
+        except aiohttp.ClientResponseError as error:
+            if _is_transient(error):
+                raise
+            # No quote endpoint for this instrument, always fetch all of it
+            self._full_only.add(stock)
+            return await self._async_fetch_due(stock, None, now)
+        merged = {
+            **snapshot.get("quote", {}),
+            **slim_section(quote, self._fields["quote"]),
+        }
+        return {**snapshot, "quote": merged}
+
+    async def _async_fetch(self, stock):
+        """Fetch a single orderbook id from the endpoint of its instrument type."""
+        instrument_type = self._storage.get_instrument_type(stock)
+        if instrument_type == pyavanza.InstrumentType.ExchangeTradedFund:
+            try:
+                return await self._async_request(
+                    "etf", pyavanza.AVANZA_API_ETF_URL, stock
+                )
+            except aiohttp.ClientResponseError as error:
+                if not _is_transient(error):
+                    # Forget the type so it is learned again on the next update
+                    self._storage.async_set_instrument_type(stock, None)
+                raise
+
+        data = await self._async_request("stock", pyavanza.AVANZA_API_STOCK_URL, stock)
+        instrument_type = data.get("type")
+        if instrument_type is not None:
+            self._storage.async_set_instrument_type(stock, instrument_type)
+        if instrument_type == pyavanza.InstrumentType.ExchangeTradedFund:
+            data = await self._async_request("etf", pyavanza.AVANZA_API_ETF_URL, stock)
+        return data
+
+    async def _async_fetch_conversion(self, conversion_currency):
+        """Fetch a single conversion currency."""
+        return await self._async_request(
+            "stock", pyavanza.AVANZA_API_STOCK_URL, conversion_currency
+        )
+
+    async def _async_request(self, endpoint, url, orderbook_id):
+        """Make a request, retrying transient failures with backoff.
+
+        Requests are not made at all while the circuit breaker of the
+        endpoint is open.
+        """
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(
+                self._failure_threshold, self._cool_down.total_seconds()
+            )
+        telemetry = self.telemetry.get(orderbook_id)
+        if telemetry is None:
+            telemetry = self.telemetry[orderbook_id] = FetchTelemetry()
+        attempt = 0
+        while True:
+            try:
+                data = await self._async_get(
+                    endpoint, url, orderbook_id, breaker, telemetry
+                )
+            except CircuitOpenError:
+                raise
+            except Exception as error:
+                if not _is_transient(error):
+                    breaker.record_success()
+                    raise
+                if breaker.record_failure():
+                    _LOGGER.warning(
+                        "Requests to the %s endpoint failed %d times in a row, "
+                        "pausing requests for %d seconds",
+                        endpoint,
+                        self._failure_threshold,
+                        self._cool_down.total_seconds(),
+                    )
+                if attempt >= self._retries:
+                    raise
+                telemetry.record_retry()
+                await asyncio.sleep(_retry_delay(error, attempt))
+                attempt += 1
+            else:
+                breaker.record_success()
+                return data
+
+    async def _async_get(self, endpoint, url, orderbook_id, breaker, telemetry):
+        """Make a single request through the limiter and record its telemetry.
+
+        The request is made with the url templates of pyavanza rather than
+        its helpers, which swallow errors and hide the size of the response.
+        The breaker is checked both before and after waiting for the limiter,
+        as the circuit may have opened meanwhile. No request is made once the
+        request budget of the last hour is used up.
+        """
+        if breaker.paused:
+            raise CircuitOpenError(f"Requests to the {endpoint} endpoint paused")
+        async with self._limiter:
+            if self._budget is not None and not self._budget.available:
+                raise BudgetExhaustedError("Request budget used up")
+            if not breaker.allow():
+                raise CircuitOpenError(f"Requests to the {endpoint} endpoint paused")
+            if self._budget is not None:
+                self._budget.record()
+            start = time.monotonic()
+            try:
+                async with self._session.get(
+                    url.format(orderbook_id=orderbook_id),
+                    raise_for_status=True,
+                    timeout=REQUEST_TIMEOUT,
+                ) as response:
+                    body = await response.read()
+                data = json_loads(body)
+            except (aiohttp.ClientError, TimeoutError, ValueError) as error:
+                telemetry.record_error(endpoint, time.monotonic() - start, error)
+                raise
+        telemetry.record_success(
+            endpoint, time.monotonic() - start, len(body), dt_util.utcnow()
+        )
+        return data
@@ -0,0 +1,123 @@
+"""Conversion currency rates for avanza_stock."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import NamedTuple
+
+from custom_components.avanza_stock.limiter import CircuitOpenError
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ConversionRate(NamedTuple):
+    """A conversion rate, the unit it converts into and the one it converts from."""
+
+    rate: float
+    unit: str
+    fetched: float
+    source: str | None = None
+
+
+class ConversionRateCache:
+    """Share conversion rates between all sensors of the integration.
+
+    Rates are keyed by conversion id and invert flag and kept for a ttl.
+    Concurrent lookups of the same conversion id share a single request.
+    """
+
+    def __init__(self):
+        """Initialize the cache."""
+        self._rates = {}
+        self._pending = {}
+
+    async def async_get_rate(self, conversion_currency, invert, ttl, fetch):
+        """Return the conversion rate, fetching it if missing or expired."""
+        key = (conversion_currency, invert)
+        cached = self._rates.get(key)
+        if cached is not None and time.monotonic() - cached.fetched < ttl:
+            return cached
+
+        future = self._pending.get(conversion_currency)
+        if future is None:
+            future = asyncio.ensure_future(fetch(conversion_currency))
+            self._pending[conversion_currency] = future
+            future.add_done_callback(
+                lambda _: self._pending.pop(conversion_currency, None)
+            )
+        try:
+            data = await asyncio.shield(future)
+            if not data:
+                return cached
+            rate = data["quote"]["last"]
+            if not rate:
+                raise ValueError(f"no last price in {data['quote']}")
+            # A currency pair like USD/SEK
+            source, unit = data["name"].split("/")[:2]
+        except CircuitOpenError as error:
+            # Requests are paused, not failing
+            _LOGGER.debug(
+                "Not updating conversion currency %d: %s", conversion_currency, error
+            )
+            return cached
+        except Exception as error:
+            _LOGGER.warning(
+                "Failed to update conversion currency %d: %s",
+                conversion_currency,
+                error,
+            )
+            return cached
+
+        if invert:
+            rate = 1.0 / rate
+            source, unit = unit, source
+        self._rates[key] = ConversionRate(rate, unit, time.monotonic(), source)
+        return self._rates[key]
+
+
+class CurrencyGraph:
+    """Derive cross rates from the fetched conversion rates.
+
+    Every conversion rate is an edge between two currencies, usable in both
+    directions. The rate between any two connected currencies is the product
+    of the rates along the shortest path between them, found once and kept
+    until the graph is rebuilt from new rates.
+    """
+
+    def __init__(self, conversion_rates):
+        """Build the graph from ConversionRate tuples."""
+        self._edges = {}
+        for conversion_rate in conversion_rates:
+            source, unit = conversion_rate.source, conversion_rate.unit
+            if source is None or not conversion_rate.rate:
+                continue
+            self._edges.setdefault(source, {})[unit] = conversion_rate.rate
+            self._edges.setdefault(unit, {})[source] = 1.0 / conversion_rate.rate
+        self._rates = {}
+
+    def get(self, source, target):
+        """Return the ConversionRate from source into target, None if unknown."""
+        key = (source, target)
+        if key not in self._rates:
+            rate = self._find_rate(source, target)
+            self._rates[key] = (
+                None if rate is None else ConversionRate(rate, target, 0.0, source)
+            )
+        return self._rates[key]
+
+    def _find_rate(self, source, target):
+        """Return the product of the rates on the shortest path."""
+        if source not in self._edges:
+            return None
+        rates = {source: 1.0}
+        queue = deque([source])
+        while queue:
+            currency = queue.popleft()
+            if currency == target:
+                return rates[currency]
+            for neighbour, rate in self._edges[currency].items():
+                if neighbour not in rates:
+                    rates[neighbour] = rates[currency] * rate
+                    queue.append(neighbour)
+        return None
@@ -0,0 +1,263 @@
+"""Price history for avanza_stock."""
+
+import contextlib
+import logging
+import mmap
+import os
+import threading
+from array import array
+from bisect import bisect_left
+
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+from homeassistant.const import ATTR_ID
+from homeassistant.core import SupportsResponse, callback
+from homeassistant.helpers.storage import STORAGE_DIR
+from homeassistant.util import dt as dt_util
+
+from custom_components.avanza_stock.const import (
+    ATTR_END,
+    ATTR_START,
+    DATA_HISTORY,
+    DOMAIN,
+    SERVICE_GET_HISTORY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+GET_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ID): cv.positive_int,
+        vol.Optional(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+    }
+)
+
+TIMESTAMP_TYPE = "q"
+PRICE_TYPE = "d"
+ITEM_SIZE = 8
+
+
+def get_history_store(hass):
+    """Return the integration-wide history store."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_HISTORY not in domain_data:
+        domain_data[DATA_HISTORY] = HistoryStore(
+            hass.config.path(STORAGE_DIR, f"{DOMAIN}_history")
+        )
+    return domain_data[DATA_HISTORY]
+
+
+def _milliseconds(value):
+    """Return a datetime as a timestamp in milliseconds, None if not set."""
+    if value is None:
+        return None
+    return int(dt_util.as_utc(value).timestamp() * 1000)
+
+
+@callback
+def async_setup_history_service(hass):
+    """Register the service returning a range of the price history once."""
+    if hass.services.has_service(DOMAIN, SERVICE_GET_HISTORY):
+        return
+
+    async def async_get_history(call):
+        stock = call.data[ATTR_ID]
+        timestamps, prices = await hass.async_add_executor_job(
+            get_history_store(hass).query,
+            stock,
+            _milliseconds(call.data.get(ATTR_START)),
+            _milliseconds(call.data.get(ATTR_END)),
+        )
+        return {"id": stock, "timestamps": timestamps, "prices": prices}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_HISTORY,
+        async_get_history,
+        schema=GET_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+
+def _read(path, typecode, start, stop):
+    """Return the items from start up to stop of a file as a list."""
+    with (
+        open(path, "rb") as file,
+        mmap.mmap(file.fileno(), stop * ITEM_SIZE, access=mmap.ACCESS_READ) as mapped,
+    ):
+        view = memoryview(mapped)[start * ITEM_SIZE :].cast(typecode)
+        try:
+            return view.tolist()
+        finally:
+            view.release()
+
+
+class HistoryStore:
+    """Keep the price history of every orderbook id in two flat files.
+
+    Timestamps in milliseconds are appended to {id}.ts as int64 and prices
+    to {id}.px as float64, so a range is found by bisecting the memory
+    mapped timestamps without reading the whole history. All methods do
+    file I/O and are meant to run in the executor.
+    """
+
+    def __init__(self, directory):
+        """Initialize the store."""
+        self._directory = directory
+        self._lengths = {}
+        self._last = {}
+        self._backfilled = set()
+        self._lock = threading.Lock()
+
+    def _paths(self, stock):
+        base = os.path.join(self._directory, str(stock))
+        return base + ".ts", base + ".px"
+
+    def _marker(self, stock):
+        return os.path.join(self._directory, f"{stock}.backfilled")
+
+    def _load(self, stock):
+        """Load the length and last timestamp of a history once.
+
+        Files of different lengths are left by an interrupted append and are
+        cut to the points written to both. A temporary file left over by an
+        interrupted backfill discards the history so it is backfilled again.
+        A marker file records that the history has been backfilled.
+        """
+        if stock in self._lengths:
+            return
+        paths = self._paths(stock)
+        sizes = []
+        for path in paths:
+            try:
+                sizes.append(os.path.getsize(path))
+            except FileNotFoundError:
+                sizes.append(0)
+        if any(os.path.exists(path + ".tmp") for path in paths):
+            _LOGGER.warning("Discarding the interrupted price history of %d", stock)
+            for name in (*paths, *(path + ".tmp" for path in paths)):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(name)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._marker(stock))
+            sizes = [0, 0]
+        elif sizes[0] != sizes[1] or sizes[0] % ITEM_SIZE:
+            size = min(sizes) // ITEM_SIZE * ITEM_SIZE
+            _LOGGER.warning(
+                "Truncating the interrupted price history of %d to %d points",
+                stock,
+                size // ITEM_SIZE,
+            )
+            for path in paths:
+                if os.path.exists(path):
+                    os.truncate(path, size)
+            sizes = [size, size]
+        if os.path.exists(self._marker(stock)):
+            self._backfilled.add(stock)
+        length = sizes[0] // ITEM_SIZE
+        self._lengths[stock] = length
+        if length:
+            self._last[stock] = _read(
+                self._paths(stock)[0], TIMESTAMP_TYPE, length - 1, length
+            )[0]
+
+    def _newer(self, stock, points):
+        """Return the points sorted and after the last stored timestamp."""
+        last = self._last.get(stock)
+        newer = []
+        for timestamp, price in sorted(points):
+            if last is None or timestamp > last:
+                newer.append((timestamp, price))
+                last = timestamp
+        return newer
+
+    def append(self, points):
+        """Append (timestamp, price) points keyed by orderbook id.
+
+        Points that are not newer than the last stored one are skipped.
+        Return the ids whose history has not been backfilled yet.
+        """
+        missing = set()
+        with self._lock:
+            os.makedirs(self._directory, exist_ok=True)
+            for stock, rows in points.items():
+                self._load(stock)
+                if stock not in self._backfilled:
+                    missing.add(stock)
+                rows = self._newer(stock, rows)
+                if not rows:
+                    continue
+                timestamps, prices = zip(*rows)
+                ts_path, px_path = self._paths(stock)
+                with open(px_path, "ab") as file:
+                    array(PRICE_TYPE, prices).tofile(file)
+                with open(ts_path, "ab") as file:
+                    array(TIMESTAMP_TYPE, timestamps).tofile(file)
+                self._lengths[stock] += len(rows)
+                self._last[stock] = timestamps[-1]
+        return missing
+
+    def backfill(self, stock, points):
+        """Insert points older than the stored history of an orderbook id.
+
+        This rewrites the history and is meant to be done once, after which
+        the id is marked as backfilled. Both files are written in full before
+        either replaces the stored one.
+        """
+        with self._lock:
+            os.makedirs(self._directory, exist_ok=True)
+            self._load(stock)
+            length = self._lengths[stock]
+            ts_path, px_path = self._paths(stock)
+            timestamps, prices = [], []
+            if length:
+                timestamps = _read(ts_path, TIMESTAMP_TYPE, 0, length)
+                prices = _read(px_path, PRICE_TYPE, 0, length)
+            first = timestamps[0] if timestamps else None
+            older = [
+                (timestamp, price)
+                for timestamp, price in sorted(dict(points).items())
+                if first is None or timestamp < first
+            ]
+            if older:
+                for path, typecode, values in (
+                    (px_path, PRICE_TYPE, [price for _, price in older] + prices),
+                    (ts_path, TIMESTAMP_TYPE, [ts for ts, _ in older] + timestamps),
+                ):
+                    with open(path + ".tmp", "wb") as file:
+                        array(typecode, values).tofile(file)
+                # Replaced timestamps last, a .ts.tmp left over marks an
+                # interrupted backfill
+                os.replace(px_path + ".tmp", px_path)
+                os.replace(ts_path + ".tmp", ts_path)
+                self._lengths[stock] = length + len(older)
+                self._last.setdefault(stock, older[-1][0])
+            with open(self._marker(stock), "wb"):
+                pass
+            self._backfilled.add(stock)
+
+    def query(self, stock, start=None, end=None):
+        """Return the timestamps and prices from start up to end, exclusive."""
+        with self._lock:
+            self._load(stock)
+            length = self._lengths[stock]
+            if not length:
+                return [], []
+            ts_path, px_path = self._paths(stock)
+            with (
+                open(ts_path, "rb") as file,
+                mmap.mmap(
+                    file.fileno(), length * ITEM_SIZE, access=mmap.ACCESS_READ
+                ) as mapped,
+            ):
+                view = memoryview(mapped).cast(TIMESTAMP_TYPE)
+                try:
+                    low = 0 if start is None else bisect_left(view, start)
+                    high = length if end is None else bisect_left(view, end)
+                    timestamps = view[low:high].tolist()
+                finally:
+                    view.release()
+            if not timestamps:
+                return [], []
+            return timestamps, _read(px_path, PRICE_TYPE, low, high)
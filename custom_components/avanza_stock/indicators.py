@@ -0,0 +1,209 @@
+"""Incremental technical indicators for avanza_stock.
+
+Every indicator is updated with one price at a time in constant time, using
+ring buffers and running sums instead of recomputing over its window.
+"""
+
+import math
+from collections import deque
+
+from custom_components.avanza_stock.const import (
+    CONF_DRAWDOWN,
+    CONF_EMA,
+    CONF_RSI,
+    CONF_SMA,
+    CONF_VOLATILITY,
+)
+
+
+class SimpleMovingAverage:
+    """Mean of the last window prices."""
+
+    currency = True
+
+    def __init__(self, window):
+        """Initialize the indicator."""
+        self.attribute = f"sma{window}"
+        self._prices = deque(maxlen=window)
+        self._sum = 0.0
+
+    def update(self, price):
+        """Add a price."""
+        if len(self._prices) == self._prices.maxlen:
+            self._sum -= self._prices[0]
+        self._prices.append(price)
+        self._sum += price
+
+    def items(self):
+        """Return the attributes, None until the window is filled."""
+        value = None
+        if len(self._prices) == self._prices.maxlen:
+            value = round(self._sum / len(self._prices), 5)
+        return [(self.attribute, value)]
+
+
+class ExponentialMovingAverage:
+    """Exponentially weighted mean with the smoothing of a window."""
+
+    currency = True
+
+    def __init__(self, window):
+        """Initialize the indicator."""
+        self.attribute = f"ema{window}"
+        self._alpha = 2 / (window + 1)
+        self._value = None
+
+    def update(self, price):
+        """Add a price."""
+        if self._value is None:
+            self._value = price
+        else:
+            self._value += self._alpha * (price - self._value)
+
+    def items(self):
+        """Return the attributes."""
+        value = round(self._value, 5) if self._value is not None else None
+        return [(self.attribute, value)]
+
+
+class RelativeStrengthIndex:
+    """Relative strength index with the smoothing of Wilder."""
+
+    currency = False
+
+    def __init__(self, window):
+        """Initialize the indicator."""
+        self.attribute = f"rsi{window}"
+        self._window = window
+        self._previous = None
+        self._count = 0
+        self._gain = 0.0
+        self._loss = 0.0
+
+    def update(self, price):
+        """Add a price."""
+        if self._previous is not None:
+            change = price - self._previous
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            self._count += 1
+            if self._count <= self._window:
+                # Simple mean over the first window of changes
+                self._gain += (gain - self._gain) / self._count
+                self._loss += (loss - self._loss) / self._count
+            else:
+                self._gain += (gain - self._gain) / self._window
+                self._loss += (loss - self._loss) / self._window
+        self._previous = price
+
+    def items(self):
+        """Return the attributes, None until the window is filled."""
+        value = None
+        if self._count >= self._window:
+            if self._loss == 0:
+                value = 100.0
+            else:
+                value = round(100 - 100 / (1 + self._gain / self._loss), 2)
+        return [(self.attribute, value)]
+
+
+class Volatility:
+    """Standard deviation of the percentage changes in a window."""
+
+    currency = False
+
+    def __init__(self, window):
+        """Initialize the indicator."""
+        self.attribute = f"volatility{window}"
+        self._returns = deque(maxlen=window)
+        self._previous = None
+        self._sum = 0.0
+        self._sum_of_squares = 0.0
+
+    def update(self, price):
+        """Add a price."""
+        if self._previous:
+            change = 100 * (price - self._previous) / self._previous
+            if len(self._returns) == self._returns.maxlen:
+                oldest = self._returns[0]
+                self._sum -= oldest
+                self._sum_of_squares -= oldest * oldest
+            self._returns.append(change)
+            self._sum += change
+            self._sum_of_squares += change * change
+        self._previous = price
+
+    def items(self):
+        """Return the attributes, None until the window is filled."""
+        value = None
+        count = len(self._returns)
+        if count == self._returns.maxlen and count > 1:
+            variance = (self._sum_of_squares - self._sum * self._sum / count) / (
+                count - 1
+            )
+            value = round(math.sqrt(max(variance, 0.0)), 3)
+        return [(self.attribute, value)]
+
+
+class Drawdown:
+    """Percentage below the highest price seen and the largest such drop."""
+
+    currency = False
+
+    def __init__(self):
+        """Initialize the indicator."""
+        self._peak = None
+        self._drawdown = None
+        self._max_drawdown = None
+
+    def update(self, price):
+        """Add a price."""
+        if self._peak is None or price > self._peak:
+            self._peak = price
+        if self._peak:
+            self._drawdown = 100 * (price - self._peak) / self._peak
+            self._max_drawdown = min(self._max_drawdown or 0.0, self._drawdown)
+
+    def items(self):
+        """Return the attributes."""
+        if self._drawdown is None:
+            return [("drawdown", None), ("maxDrawdown", None)]
+        return [
+            ("drawdown", round(self._drawdown, 3)),
+            ("maxDrawdown", round(self._max_drawdown, 3)),
+        ]
+
+
+class IndicatorEngine:
+    """The configured indicators of a single sensor."""
+
+    def __init__(self, config):
+        """Create the indicators from the indicators configuration."""
+        indicators = []
+        indicators += [
+            SimpleMovingAverage(window) for window in config.get(CONF_SMA, [])
+        ]
+        indicators += [
+            ExponentialMovingAverage(window) for window in config.get(CONF_EMA, [])
+        ]
+        indicators += [
+            RelativeStrengthIndex(window) for window in config.get(CONF_RSI, [])
+        ]
+        indicators += [Volatility(window) for window in config.get(CONF_VOLATILITY, [])]
+        if config.get(CONF_DRAWDOWN):
+            indicators.append(Drawdown())
+        self._indicators = tuple(indicators)
+        self.currency_attributes = tuple(
+            indicator.attribute for indicator in indicators if indicator.currency
+        )
+
+    def update(self, price):
+        """Add a price to every indicator."""
+        for indicator in self._indicators:
+            indicator.update(price)
+
+    def attributes(self):
+        """Return the attributes of every indicator."""
+        attributes = {}
+        for indicator in self._indicators:
+            attributes.update(indicator.items())
+        return attributes
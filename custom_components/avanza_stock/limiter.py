@@ -0,0 +1,275 @@
+"""Request limiting for avanza_stock."""
+
+import asyncio
+import collections
+import logging
+import math
+import time
+
+from custom_components.avanza_stock.const import DATA_BUDGET, DATA_LIMITER, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+SECONDS_PER_HOUR = 3600.0
+# Weight of a new observation in the moving average of the volatility
+VOLATILITY_SMOOTHING = 0.2
+
+
+def get_request_limiter(hass, max_concurrent, requests_per_second):
+    """Return the request limiter shared by all platforms.
+
+    The limits of the first platform are used if they differ.
+    """
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    limiter = domain_data.get(DATA_LIMITER)
+    if limiter is None:
+        limiter = domain_data[DATA_LIMITER] = RequestLimiter(
+            max_concurrent, requests_per_second
+        )
+    elif (limiter.max_concurrent, limiter.requests_per_second) != (
+        max_concurrent,
+        requests_per_second,
+    ):
+        _LOGGER.warning(
+            "Ignoring max_concurrent_requests %d and requests_per_second %s, all "
+            "platforms share the limits of %d and %s set first",
+            max_concurrent,
+            requests_per_second,
+            limiter.max_concurrent,
+            limiter.requests_per_second,
+        )
+    return limiter
+
+
+class RequestLimiter:
+    """Bound the number of in-flight requests and the rate they start at.
+
+    Concurrency is limited by a semaphore and the request rate by a token
+    bucket that holds at most one second worth of requests.
+    """
+
+    def __init__(self, max_concurrent, requests_per_second):
+        """Initialize the limiter."""
+        self.max_concurrent = max_concurrent
+        self.requests_per_second = requests_per_second
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._rate = requests_per_second
+        self._capacity = max(1.0, requests_per_second)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        """Wait for a free slot and a token."""
+        await self._semaphore.acquire()
+        try:
+            await self._async_acquire_token()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        """Release the slot."""
+        self._semaphore.release()
+
+    async def _async_acquire_token(self):
+        """Take a token from the bucket, waiting for a refill if empty."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._capacity, self._tokens + (now - self._updated) * self._rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a request while the circuit is open."""
+
+
+class BudgetExhaustedError(CircuitOpenError):
+    """Raised instead of making a request when the request budget is used up."""
+
+
+class CircuitBreaker:
+    """Stop requests to an endpoint for a while after repeated failures.
+
+    After failure_threshold consecutive failures the circuit opens and no
+    requests are allowed until cool_down seconds have passed. Then a single
+    request is let through, closing the circuit if it succeeds and opening
+    it again if it fails.
+    """
+
+    def __init__(self, failure_threshold, cool_down):
+        """Initialize the breaker."""
+        self._failure_threshold = failure_threshold
+        self._cool_down = cool_down
+        self._failures = 0
+        self._opened = None
+        self._probing = False
+
+    @property
+    def paused(self):
+        """Return True while no requests are allowed."""
+        return self._opened is not None and (
+            self._probing or time.monotonic() - self._opened < self._cool_down
+        )
+
+    def allow(self):
+        """Return True if a request may be made now and make it count."""
+        if self.paused:
+            return False
+        if self._opened is not None:
+            self._probing = True
+        return True
+
+    def record_success(self):
+        """Close the circuit."""
+        self._failures = 0
+        self._opened = None
+        self._probing = False
+
+    def record_failure(self):
+        """Count a failure, return True if it opened the circuit."""
+        self._failures += 1
+        if self._probing:
+            # The request let through after the cool-down failed as well
+            self._opened = time.monotonic()
+            self._probing = False
+        elif self._opened is None and self._failures >= self._failure_threshold:
+            self._opened = time.monotonic()
+            return True
+        return False
+
+
+def allocate_rates(weights, budget, low, high):
+    """Split a budget of requests over ids in proportion to their weights.
+
+    Every id gets a rate of at least low and at most high, what an id cannot
+    use goes to the others. The weights must be positive. The scale of the
+    weights is found by bisection, as the sum of the clamped rates grows
+    with it.
+    """
+    if not weights:
+        return {}
+    if len(weights) * low >= budget:
+        return dict.fromkeys(weights, low)
+    if len(weights) * high <= budget:
+        return dict.fromkeys(weights, high)
+
+    def clamped(scale):
+        return sum(min(high, max(low, scale * weight)) for weight in weights.values())
+
+    lower, upper = 0.0, high / min(weights.values())
+    for _ in range(50):
+        scale = (lower + upper) / 2
+        if clamped(scale) > budget:
+            upper = scale
+        else:
+            lower = scale
+    return {
+        stock: min(high, max(low, lower * weight)) for stock, weight in weights.items()
+    }
+
+
+def get_request_budget(hass, requests_per_hour):
+    """Return the request budget shared by all platforms that set one.
+
+    The budget of the first platform is used if they differ.
+    """
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    budget = domain_data.get(DATA_BUDGET)
+    if budget is None:
+        budget = domain_data[DATA_BUDGET] = RequestBudget(requests_per_hour)
+    elif budget.requests_per_hour != requests_per_hour:
+        _LOGGER.warning(
+            "Ignoring requests_per_hour %d, all platforms share the budget "
+            "of %d requests per hour set first",
+            requests_per_hour,
+            budget.requests_per_hour,
+        )
+    return budget
+
+
+class RequestBudget:
+    """Keep the requests within an hourly budget and weigh the ids against it.
+
+    The requests made in the last hour are counted, which makes the budget a
+    hard ceiling. The weight of an id grows with the value of the position
+    and the recent volatility of its price.
+    """
+
+    def __init__(self, requests_per_hour):
+        """Initialize the budget."""
+        self.requests_per_hour = requests_per_hour
+        self._stocks = 0
+        self._shares = {}
+        self._requests = collections.deque()
+        self._volatility = {}
+
+    def add(self, shares):
+        """Add the ids of a platform, shares is the number of shares by id."""
+        self._stocks += len(shares)
+        for stock, count in shares.items():
+            self._shares[stock] = self._shares.get(stock, 0) + count
+
+    def share(self, stocks):
+        """Return the requests per hour of a platform with a number of ids.
+
+        Every platform gets a part of the budget by its number of ids.
+        """
+        if not self._stocks:
+            return self.requests_per_hour
+        return self.requests_per_hour * stocks / self._stocks
+
+    @property
+    def available(self):
+        """Return the number of requests left of the last hour."""
+        since = time.monotonic() - SECONDS_PER_HOUR
+        while self._requests and self._requests[0] <= since:
+            self._requests.popleft()
+        return max(0, int(self.requests_per_hour) - len(self._requests))
+
+    def record(self):
+        """Count a request."""
+        self._requests.append(time.monotonic())
+
+    def observe(self, stock, previous, price, seconds):
+        """Update the volatility of an id with the price change since a poll.
+
+        The change is scaled to an hour, so ids polled at different intervals
+        compare.
+        """
+        if not previous or not price or seconds <= 0:
+            return
+        change = abs(math.log(price / previous)) / math.sqrt(seconds / SECONDS_PER_HOUR)
+        current = self._volatility.get(stock)
+        if current is not None:
+            change = current + VOLATILITY_SMOOTHING * (change - current)
+        self._volatility[stock] = change
+
+    def weights(self, prices):
+        """Return the weights of ids by their prices in a common currency.
+
+        Every id has an equal base weight on top of its share of the total
+        position value, so ids without shares are still polled. The weight
+        is scaled by the volatility of the id relative to the mean.
+        """
+        values = {
+            stock: self._shares.get(stock, 0) * price for stock, price in prices.items()
+        }
+        total = sum(values.values())
+        base = 1 / len(values)
+        mean = sum(self._volatility.get(stock, 0) for stock in values) / len(values)
+        weights = {}
+        for stock, value in values.items():
+            weight = base + (value / total if total else 0)
+            if mean:
+                weight *= 1 + self._volatility.get(stock, 0) / mean
+            weights[stock] = weight
+        return weights
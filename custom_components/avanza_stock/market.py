@@ -0,0 +1,84 @@
+"""Trading hours of the markets available on Avanza."""
+
+from datetime import datetime, time, timedelta
+from typing import NamedTuple
+
+from homeassistant.util import dt as dt_util
+
+# Prices are fetched once more this long after close to get the closing price
+AFTER_CLOSE_DELAY = timedelta(minutes=20)
+
+
+class Market(NamedTuple):
+    """Regular trading hours of a market in its local time zone."""
+
+    time_zone: str
+    open: time
+    close: time
+
+
+# Keyed by the listing country code
+MARKETS = {
+    "BE": Market("Europe/Brussels", time(9, 0), time(17, 30)),
+    "CA": Market("America/Toronto", time(9, 30), time(16, 0)),
+    "DE": Market("Europe/Berlin", time(9, 0), time(17, 30)),
+    "DK": Market("Europe/Copenhagen", time(9, 0), time(17, 0)),
+    "FI": Market("Europe/Helsinki", time(10, 0), time(18, 30)),
+    "FR": Market("Europe/Paris", time(9, 0), time(17, 30)),
+    "IT": Market("Europe/Rome", time(9, 0), time(17, 30)),
+    "NL": Market("Europe/Amsterdam", time(9, 0), time(17, 30)),
+    "NO": Market("Europe/Oslo", time(9, 0), time(16, 20)),
+    "PT": Market("Europe/Lisbon", time(8, 0), time(16, 30)),
+    "SE": Market("Europe/Stockholm", time(9, 0), time(17, 30)),
+    "US": Market("America/New_York", time(9, 30), time(16, 0)),
+}
+
+
+def get_market(data):
+    """Return the market of an instrument, None if unknown."""
+    listing = data.get("listing") or {}
+    return MARKETS.get(listing.get("countryCode"))
+
+
+def _local_times(market, day):
+    """Return the open and after close update times of a day."""
+    time_zone = dt_util.get_time_zone(market.time_zone)
+    market_open = datetime.combine(day, market.open, time_zone)
+    market_close = datetime.combine(day, market.close, time_zone)
+    return market_open, market_close, market_close + AFTER_CLOSE_DELAY
+
+
+def is_market_open(market, now):
+    """Return True if the market is open."""
+    local = now.astimezone(dt_util.get_time_zone(market.time_zone))
+    if local.weekday() >= 5:
+        return False
+    market_open, market_close, _ = _local_times(market, local.date())
+    return market_open <= local < market_close
+
+
+def next_market_update(market, now, open_interval, offset=timedelta(0)):
+    """Return when to update next.
+
+    Every open_interval while the market is open, once after close and then
+    not again until the market opens on the next weekday. All times are
+    shifted by offset, which spreads the updates of the instruments of a
+    market when each has its own offset below open_interval.
+    """
+    local = now.astimezone(dt_util.get_time_zone(market.time_zone))
+    day = local.date()
+    if local.weekday() < 5:
+        market_open, market_close, after_close = _local_times(market, day)
+        first = market_open + offset
+        if local < first:
+            return first
+        if local < market_close:
+            slots = (local - first) // open_interval + 1
+            return min(first + slots * open_interval, after_close + offset)
+        if local < after_close + offset:
+            return after_close + offset
+    day += timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    market_open, _, _ = _local_times(market, day)
+    return market_open + offset
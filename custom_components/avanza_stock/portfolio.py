@@ -0,0 +1,131 @@
+"""Portfolio aggregation for avanza_stock."""
+
+from collections import Counter
+from operator import mul, sub
+from typing import NamedTuple
+
+from custom_components.avanza_stock.const import TOTAL_CHANGE_PRICE_MAPPING
+
+
+class Holding(NamedTuple):
+    """A configured stock with a number of shares."""
+
+    name: str
+    stock: int
+    shares: float
+    purchase_price: float | None
+    conversion: tuple
+    currency: str | None
+    convert_to: str | None = None
+
+
+def _manual_snapshot(holding):
+    """Return a snapshot for a holding that is not tracked on Avanza."""
+    prices = dict.fromkeys(
+        (price for _, price in TOTAL_CHANGE_PRICE_MAPPING), holding.purchase_price
+    )
+    return {
+        "quote": {"last": holding.purchase_price, "change": 0},
+        "historicalClosingPrices": prices,
+        "listing": {"currency": holding.currency},
+    }
+
+
+def _dot(left, right):
+    """Return the sum of the element-wise product."""
+    return sum(map(mul, left, right))
+
+
+def compute_portfolio(holdings, snapshots, conversion_rates, currency_graph=None):
+    """Compute the portfolio aggregates of all holdings in one batch.
+
+    The holdings are first gathered into columns in a common currency,
+    after which every aggregate is a single reduction over those columns.
+    Holdings in another currency than the majority of the portfolio are
+    converted with the cross rates of currency_graph. Holdings without data
+    or without a cross rate are left out and listed under excluded.
+    """
+    rows = []
+    missing = []
+    for holding in holdings:
+        if holding.stock == 0:
+            data = _manual_snapshot(holding)
+        else:
+            data = snapshots.get(holding.stock)
+        rate = 1.0
+        unit = holding.currency or (data or {}).get("listing", {}).get("currency")
+        if holding.conversion[0]:
+            conversion_rate = conversion_rates.get(holding.conversion)
+            if conversion_rate is None:
+                data = None
+            else:
+                rate = conversion_rate.rate
+                unit = holding.currency or conversion_rate.unit
+        elif holding.convert_to and currency_graph is not None and unit:
+            conversion_rate = currency_graph.get(unit, holding.convert_to)
+            if conversion_rate is not None:
+                rate = conversion_rate.rate
+                unit = holding.convert_to
+        if not data:
+            missing.append(holding.name)
+            continue
+        rows.append((holding, data, rate, unit))
+
+    currencies = Counter(unit for _, _, _, unit in rows)
+    currency = currencies.most_common(1)[0][0] if currencies else None
+    if currency_graph is not None:
+        for index, (holding, data, rate, unit) in enumerate(rows):
+            if unit != currency:
+                conversion_rate = currency_graph.get(unit, currency)
+                if conversion_rate is not None:
+                    rows[index] = (holding, data, rate * conversion_rate.rate, currency)
+    excluded = missing + [row[0].name for row in rows if row[3] != currency]
+    rows = [row for row in rows if row[3] == currency]
+
+    names = [holding.name for holding, _, _, _ in rows]
+    shares = [holding.shares for holding, _, _, _ in rows]
+    prices = [data["quote"]["last"] * rate for _, data, rate, _ in rows]
+    changes = [data["quote"].get("change", 0) * rate for _, data, rate, _ in rows]
+    values = list(map(mul, shares, prices))
+    total_value = sum(values)
+    total_change = _dot(shares, changes)
+
+    attributes = {
+        "totalValue": round(total_value, 5),
+        "totalChange": round(total_change, 5),
+    }
+    previous_value = total_value - total_change
+    attributes["changePercent"] = (
+        round(100 * total_change / previous_value, 3) if previous_value else None
+    )
+
+    for change, price in TOTAL_CHANGE_PRICE_MAPPING:
+        historical = [
+            (data.get("historicalClosingPrices") or {}).get(price)
+            for _, data, _, _ in rows
+        ]
+        if None in historical:
+            attributes[change] = "unknown"
+            continue
+        historical = [value * row[2] for value, row in zip(historical, rows)]
+        attributes[change] = round(_dot(shares, map(sub, prices, historical)), 5)
+
+    purchased = [
+        index
+        for index, (holding, _, _, _) in enumerate(rows)
+        if holding.purchase_price is not None
+    ]
+    if purchased:
+        cost = sum(shares[index] * rows[index][0].purchase_price for index in purchased)
+        profit_loss = sum(values[index] for index in purchased) - cost
+        attributes["totalProfitLoss"] = round(profit_loss, 5)
+        attributes["profitLossPercentage"] = (
+            round(100 * profit_loss / cost, 3) if cost else None
+        )
+
+    attributes["weights"] = {
+        name: round(100 * value / total_value, 3) if total_value else None
+        for name, value in zip(names, values)
+    }
+    attributes["excluded"] = excluded
+    return round(total_value, 5), currency, attributes
@@ -0,0 +1,240 @@
+"""Streaming quotes from the Avanza push channel for avanza_stock.
+
+The push channel speaks the Bayeux protocol (CometD) over a websocket. A
+single connection shared by all platforms subscribes to the quote channel of
+every orderbook id and reconnects with a growing delay whenever it is lost.
+"""
+
+import asyncio
+import itertools
+import logging
+
+import aiohttp
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import callback
+
+from custom_components.avanza_stock.const import DATA_PUSH, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+QUOTE_CHANNEL = "/quotes/{orderbook_id}"
+QUOTE_CHANNEL_PREFIX = "/quotes/"
+RECONNECT_DELAY = 5
+MAX_RECONNECT_DELAY = 300
+HEARTBEAT = 30
+
+# Push message keys and the quote keys of the market guide they update
+PUSH_QUOTE_MAPPING = {
+    "buyPrice": "buy",
+    "sellPrice": "sell",
+    "lastPrice": "last",
+    "highestPrice": "highest",
+    "lowestPrice": "lowest",
+    "change": "change",
+    "changePercent": "changePercent",
+    "totalValueTraded": "totalValueTraded",
+    "totalVolumeTraded": "totalVolumeTraded",
+    "lastUpdated": "updated",
+}
+
+
+def parse_quote(data):
+    """Return the quote keys updated by a push message."""
+    return {
+        key: data[push_key]
+        for push_key, key in PUSH_QUOTE_MAPPING.items()
+        if data.get(push_key) is not None
+    }
+
+
+def get_push_client(hass, session, url):
+    """Return the push client shared by all platforms.
+
+    The url of the first platform is used if they differ.
+    """
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    client = domain_data.get(DATA_PUSH)
+    if client is None:
+        client = domain_data[DATA_PUSH] = AvanzaPushClient(session, url)
+    elif client.url != url:
+        _LOGGER.warning(
+            "Ignoring push_url %s, all platforms share the push channel of %s "
+            "set first",
+            url,
+            client.url,
+        )
+    return client
+
+
+class PushError(Exception):
+    """Raised when the push channel rejects the connection."""
+
+
+class AvanzaPushClient:
+    """Subscribe to the quotes of orderbook ids over a single websocket."""
+
+    def __init__(self, session, url):
+        """Initialize the client."""
+        self._session = session
+        self.url = url
+        self._stocks = set()
+        self._listeners = []
+        self._ids = itertools.count(1)
+        self._client_id = None
+        self._ws = None
+        self._hass = None
+        self._task = None
+        self.subscribed = set()
+
+    @callback
+    def async_add_listener(self, stocks, on_quotes, on_disconnect):
+        """Subscribe to the quotes of orderbook ids for a listener.
+
+        on_quotes is called with the quotes of the listener's ids keyed by
+        orderbook id of every batch of push messages and on_disconnect when
+        a connection with subscriptions is lost.
+        """
+        stocks = frozenset(stocks)
+        self._listeners.append((stocks, on_quotes, on_disconnect))
+        new = stocks - self._stocks
+        self._stocks |= new
+        if new and self._ws is not None and self._client_id is not None:
+            # Already past the handshake, subscribe on the open connection
+            self._hass.async_create_background_task(
+                self._async_subscribe(self._ws, new), "avanza_stock push subscribe"
+            )
+
+    def start(self, hass):
+        """Start streaming in the background, once for all listeners."""
+        if self._task is not None:
+            return
+        self._hass = hass
+        self._task = hass.async_create_background_task(
+            self._async_run(), "avanza_stock push"
+        )
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self.async_stop)
+
+    @callback
+    def async_stop(self, *_):
+        """Stop streaming."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _async_run(self):
+        """Stream until stopped, reconnecting after failures."""
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                await self._async_stream()
+                delay = RECONNECT_DELAY
+            except (aiohttp.ClientError, TimeoutError, ValueError, PushError) as error:
+                _LOGGER.warning("Push channel failed: %s", error)
+            finally:
+                if self.subscribed:
+                    self.subscribed = set()
+                    for _, _, on_disconnect in self._listeners:
+                        on_disconnect()
+            _LOGGER.debug("Reconnecting to the push channel in %d seconds", delay)
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, MAX_RECONNECT_DELAY)
+
+    def _message(self, channel, **fields):
+        message = {"channel": channel, "id": str(next(self._ids)), **fields}
+        if self._client_id is not None:
+            message["clientId"] = self._client_id
+        return message
+
+    async def _async_stream(self):
+        """Handshake, subscribe and handle messages until disconnected."""
+        async with self._session.ws_connect(self.url, heartbeat=HEARTBEAT) as ws:
+            self._client_id = None
+            self._ws = ws
+            try:
+                await self._async_handle_stream(ws)
+            finally:
+                self._ws = None
+
+    async def _async_handle_stream(self, ws):
+        """Handshake and handle messages until disconnected."""
+        await ws.send_json(
+            [
+                self._message(
+                    "/meta/handshake",
+                    version="1.0",
+                    supportedConnectionTypes=["websocket"],
+                )
+            ]
+        )
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                break
+            replies = []
+            quotes = {}
+            for message in msg.json():
+                replies += self._handle_message(message, quotes)
+            if quotes:
+                self._dispatch(quotes)
+            if replies:
+                await ws.send_json(replies)
+
+    def _dispatch(self, quotes):
+        """Pass each listener the quotes of its orderbook ids."""
+        for stocks, on_quotes, _ in self._listeners:
+            batch = {stock: quote for stock, quote in quotes.items() if stock in stocks}
+            if batch:
+                on_quotes(batch)
+
+    async def _async_subscribe(self, ws, stocks):
+        """Subscribe to more orderbook ids on an open connection."""
+        try:
+            await ws.send_json(self._subscriptions(stocks))
+        except (aiohttp.ClientError, ConnectionError) as error:
+            # Subscribed to all ids again after reconnecting
+            _LOGGER.debug("Failed to subscribe to the push channel: %s", error)
+
+    def _subscriptions(self, stocks):
+        return [
+            self._message(
+                "/meta/subscribe",
+                subscription=QUOTE_CHANNEL.format(orderbook_id=stock),
+            )
+            for stock in stocks
+        ]
+
+    def _connect(self):
+        return self._message("/meta/connect", connectionType="websocket")
+
+    def _handle_message(self, message, quotes):
+        """Handle a single message, return the messages to send in reply.
+
+        Quotes are collected in quotes, later ones of the same orderbook id
+        updating earlier ones.
+        """
+        channel = message.get("channel", "")
+        if channel.startswith(QUOTE_CHANNEL_PREFIX):
+            quote = parse_quote(message.get("data") or {})
+            if quote:
+                stock = int(channel[len(QUOTE_CHANNEL_PREFIX) :])
+                quotes[stock] = {**quotes.get(stock, {}), **quote}
+            return []
+        if not channel.startswith("/meta/"):
+            return []
+        if not message.get("successful", False):
+            if channel == "/meta/subscribe":
+                _LOGGER.debug("Push subscription rejected: %s", message)
+                return []
+            raise PushError(f"{channel} failed: {message.get('error')}")
+        if channel == "/meta/handshake":
+            self._client_id = message["clientId"]
+            return [*self._subscriptions(self._stocks), self._connect()]
+        if channel == "/meta/subscribe":
+            subscription = message.get("subscription", "")
+            if subscription.startswith(QUOTE_CHANNEL_PREFIX):
+                self.subscribed.add(int(subscription[len(QUOTE_CHANNEL_PREFIX) :]))
+            return []
+        if channel == "/meta/connect":
+            if (message.get("advice") or {}).get("reconnect") == "handshake":
+                raise PushError("Server asked for a new handshake")
+            return [self._connect()]
+        return []
@@ -5,11 +5,11 @@ For more details about this platform, please refer to the documentation at
 https://github.com/custom-components/sensor.avanza_stock/blob/master/README.md
 """
 
+import functools
 import logging
 from datetime import timedelta
 
 import homeassistant.helpers.config_validation as cv
-import pyavanza
 import voluptuous as vol
 from homeassistant.components.sensor import (
     PLATFORM_SCHEMA,
@@ -22,39 +22,125 @@ from homeassistant.const import (
     CONF_ID,
     CONF_MONITORED_CONDITIONS,
     CONF_NAME,
+    CONF_SCAN_INTERVAL,
+    EntityCategory,
+    UnitOfTime,
 )
-from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
 
+from custom_components.avanza_stock.alerts import get_alert_registry
+from custom_components.avanza_stock.attributes import SKIP, compile_attribute_plan
 from custom_components.avanza_stock.const import (
+    ATTR_LAST_CHANGED,
+    ATTR_STALE,
     ATTR_TRENDING,
-    CHANGE_PERCENT_PRICE_MAPPING,
-    CHANGE_PRICE_MAPPING,
+    CONF_ALERTS,
+    CONF_CHANGE_PERCENT,
+    CONF_CIRCUIT_BREAKER_COOL_DOWN,
+    CONF_CIRCUIT_BREAKER_THRESHOLD,
+    CONF_CONVERSION_CURRENCIES,
     CONF_CONVERSION_CURRENCY,
+    CONF_CONVERSION_CURRENCY_TTL,
+    CONF_CONVERT_TO,
+    CONF_DRAWDOWN,
+    CONF_EMA,
+    CONF_HISTORY,
+    CONF_INDICATORS,
     CONF_INVERT_CONVERSION_CURRENCY,
+    CONF_MARKET_OPEN_INTERVAL,
+    CONF_MAX_CONCURRENT_REQUESTS,
+    CONF_METRIC_SENSORS,
+    CONF_MIN_CHANGE_PERCENT,
+    CONF_MIN_PRICE_CHANGE,
+    CONF_PORTFOLIO,
+    CONF_PRICE,
     CONF_PURCHASE_DATE,
     CONF_PURCHASE_PRICE,
+    CONF_PUSH_URL,
+    CONF_RECORDED_ATTRIBUTES,
+    CONF_REQUESTS_PER_HOUR,
+    CONF_REQUESTS_PER_SECOND,
+    CONF_RETRIES,
+    CONF_RSI,
     CONF_SHARES,
     CONF_SHOW_TRENDING_ICON,
+    CONF_SMA,
     CONF_STOCK,
-    CURRENCY_ATTRIBUTE,
+    CONF_TELEMETRY,
+    CONF_VOLATILITY,
+    DATA_CONVERSION_CACHE,
+    DATA_TELEMETRY_SENSORS,
+    DEFAULT_CIRCUIT_BREAKER_COOL_DOWN,
+    DEFAULT_CIRCUIT_BREAKER_THRESHOLD,
+    DEFAULT_CONVERSION_CURRENCY_TTL,
+    DEFAULT_HISTORY,
+    DEFAULT_MARKET_OPEN_INTERVAL,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEFAULT_METRIC_SENSORS,
     DEFAULT_NAME,
+    DEFAULT_RECORDED_ATTRIBUTES,
+    DEFAULT_REQUESTS_PER_SECOND,
+    DEFAULT_RETRIES,
     DEFAULT_SHOW_TRENDING_ICON,
+    DEFAULT_TELEMETRY,
+    DOMAIN,
+    METRIC_SENSOR_STATES,
     MONITORED_CONDITIONS,
-    MONITORED_CONDITIONS_COMPANY,
     MONITORED_CONDITIONS_DEFAULT,
-    MONITORED_CONDITIONS_DIVIDENDS,
-    MONITORED_CONDITIONS_KEYRATIOS,
-    MONITORED_CONDITIONS_LISTING,
-    MONITORED_CONDITIONS_PRICE,
-    MONITORED_CONDITIONS_QUOTE,
-    PRICE_MAPPING,
-    TOTAL_CHANGE_PRICE_MAPPING,
+    RECORDED_ATTRIBUTE_GROUPS,
 )
+from custom_components.avanza_stock.coordinator import AvanzaStockCoordinator
+from custom_components.avanza_stock.currency import ConversionRateCache
+from custom_components.avanza_stock.history import (
+    async_setup_history_service,
+    get_history_store,
+)
+from custom_components.avanza_stock.indicators import IndicatorEngine
+from custom_components.avanza_stock.limiter import (
+    get_request_budget,
+    get_request_limiter,
+)
+from custom_components.avanza_stock.portfolio import Holding, compute_portfolio
+from custom_components.avanza_stock.session import get_session
+from custom_components.avanza_stock.snapshot import compile_snapshot_fields
+from custom_components.avanza_stock.statistics import async_setup_services
+from custom_components.avanza_stock.storage import async_get_storage
 
 _LOGGER = logging.getLogger(__name__)
 
 SCAN_INTERVAL = timedelta(minutes=60)
 
+INDICATORS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(CONF_SMA, default=[]): vol.All(
+            cv.ensure_list, [vol.All(vol.Coerce(int), vol.Range(min=1))]
+        ),
+        vol.Optional(CONF_EMA, default=[]): vol.All(
+            cv.ensure_list, [vol.All(vol.Coerce(int), vol.Range(min=1))]
+        ),
+        vol.Optional(CONF_RSI, default=[]): vol.All(
+            cv.ensure_list, [vol.All(vol.Coerce(int), vol.Range(min=1))]
+        ),
+        vol.Optional(CONF_VOLATILITY, default=[]): vol.All(
+            cv.ensure_list, [vol.All(vol.Coerce(int), vol.Range(min=2))]
+        ),
+        vol.Optional(CONF_DRAWDOWN, default=False): cv.boolean,
+    }
+)
+
+ALERTS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(CONF_PRICE, default=[]): vol.All(
+            cv.ensure_list, [vol.Coerce(float)]
+        ),
+        vol.Optional(CONF_CHANGE_PERCENT, default=[]): vol.All(
+            cv.ensure_list, [vol.Coerce(float)]
+        ),
+    }
+)
+
 STOCK_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_ID): cv.positive_int,
@@ -65,6 +151,8 @@ STOCK_SCHEMA = vol.Schema(
         vol.Optional(CONF_CONVERSION_CURRENCY): cv.positive_int,
         vol.Optional(CONF_INVERT_CONVERSION_CURRENCY, default=False): cv.boolean,
         vol.Optional(CONF_CURRENCY): cv.string,
+        vol.Optional(CONF_CONVERT_TO): vol.All(cv.string, vol.Upper),
+        vol.Optional(CONF_ALERTS): ALERTS_SCHEMA,
     }
 )
 
@@ -80,23 +168,144 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
         vol.Optional(CONF_CONVERSION_CURRENCY): cv.positive_int,
         vol.Optional(CONF_INVERT_CONVERSION_CURRENCY, default=False): cv.boolean,
         vol.Optional(CONF_CURRENCY): cv.string,
+        vol.Optional(CONF_CONVERT_TO): vol.All(cv.string, vol.Upper),
+        vol.Optional(CONF_ALERTS): ALERTS_SCHEMA,
+        vol.Optional(CONF_CONVERSION_CURRENCIES, default=[]): vol.All(
+            cv.ensure_list, [cv.positive_int]
+        ),
+        vol.Optional(
+            CONF_CONVERSION_CURRENCY_TTL, default=DEFAULT_CONVERSION_CURRENCY_TTL
+        ): cv.time_period,
+        vol.Optional(
+            CONF_MARKET_OPEN_INTERVAL, default=DEFAULT_MARKET_OPEN_INTERVAL
+        ): cv.time_period,
+        vol.Optional(
+            CONF_MAX_CONCURRENT_REQUESTS, default=DEFAULT_MAX_CONCURRENT_REQUESTS
+        ): cv.positive_int,
+        vol.Optional(
+            CONF_REQUESTS_PER_SECOND, default=DEFAULT_REQUESTS_PER_SECOND
+        ): vol.All(vol.Coerce(float), vol.Range(min=0, min_included=False)),
+        vol.Optional(CONF_REQUESTS_PER_HOUR): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
+        vol.Optional(CONF_RETRIES, default=DEFAULT_RETRIES): cv.positive_int,
+        vol.Optional(
+            CONF_CIRCUIT_BREAKER_THRESHOLD, default=DEFAULT_CIRCUIT_BREAKER_THRESHOLD
+        ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional(
+            CONF_CIRCUIT_BREAKER_COOL_DOWN, default=DEFAULT_CIRCUIT_BREAKER_COOL_DOWN
+        ): cv.time_period,
+        vol.Optional(CONF_PUSH_URL): vol.Url(),
+        vol.Optional(CONF_HISTORY, default=DEFAULT_HISTORY): cv.boolean,
+        vol.Optional(CONF_INDICATORS): INDICATORS_SCHEMA,
         vol.Optional(
             CONF_SHOW_TRENDING_ICON, default=DEFAULT_SHOW_TRENDING_ICON
         ): cv.boolean,
         vol.Optional(
             CONF_MONITORED_CONDITIONS, default=MONITORED_CONDITIONS_DEFAULT
         ): vol.All(cv.ensure_list, [vol.In(MONITORED_CONDITIONS)]),
+        vol.Optional(CONF_PORTFOLIO): cv.string,
+        vol.Optional(CONF_TELEMETRY, default=DEFAULT_TELEMETRY): cv.boolean,
+        vol.Optional(
+            CONF_RECORDED_ATTRIBUTES, default=DEFAULT_RECORDED_ATTRIBUTES
+        ): vol.All(cv.ensure_list, [vol.In(RECORDED_ATTRIBUTE_GROUPS)]),
+        vol.Optional(CONF_METRIC_SENSORS, default=DEFAULT_METRIC_SENSORS): vol.All(
+            cv.ensure_list, [vol.In(METRIC_SENSOR_STATES)]
+        ),
+        vol.Optional(CONF_MIN_PRICE_CHANGE): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
+        vol.Optional(CONF_MIN_CHANGE_PERCENT): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
     }
 )
 
 
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Set up the Avanza Stock sensor."""
-    session = async_create_clientsession(hass)
+    session = get_session(hass)
     monitored_conditions = config.get(CONF_MONITORED_CONDITIONS)
     show_trending_icon = config.get(CONF_SHOW_TRENDING_ICON)
+    min_price_change = config.get(CONF_MIN_PRICE_CHANGE)
+    min_change_percent = config.get(CONF_MIN_CHANGE_PERCENT)
+    indicators = config.get(CONF_INDICATORS)
+    metric_sensors = config.get(CONF_METRIC_SENSORS)
+    sensor_class = _sensor_class(
+        AvanzaStockSensor,
+        _unrecorded_attribute_set(config.get(CONF_RECORDED_ATTRIBUTES), indicators),
+    )
     stock = config.get(CONF_STOCK)
+    alerts = None
+    position_shares = {}
+    if isinstance(stock, int):
+        stocks = {stock}
+        if stock:
+            position_shares[stock] = config.get(CONF_SHARES) or 0
+        alerts = _register_alerts(hass, alerts, stock, config.get(CONF_ALERTS))
+        conversions = {
+            (
+                config.get(CONF_CONVERSION_CURRENCY),
+                config.get(CONF_INVERT_CONVERSION_CURRENCY),
+            )
+        }
+    else:
+        stocks = set()
+        conversions = set()
+        for s in stock:
+            stocks.add(s.get(CONF_ID))
+            if s.get(CONF_ID):
+                position_shares[s.get(CONF_ID)] = position_shares.get(
+                    s.get(CONF_ID), 0
+                ) + (s.get(CONF_SHARES) or 0)
+            alerts = _register_alerts(hass, alerts, s.get(CONF_ID), s.get(CONF_ALERTS))
+            conversions.add(
+                (
+                    s.get(CONF_CONVERSION_CURRENCY),
+                    s.get(CONF_INVERT_CONVERSION_CURRENCY),
+                )
+            )
+    # Only used to derive cross rates for convert_to
+    conversions.update(
+        (conversion_currency, False)
+        for conversion_currency in config.get(CONF_CONVERSION_CURRENCIES)
+    )
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_CONVERSION_CACHE not in domain_data:
+        domain_data[DATA_CONVERSION_CACHE] = ConversionRateCache()
+    budget = None
+    requests_per_hour = config.get(CONF_REQUESTS_PER_HOUR)
+    if requests_per_hour is not None:
+        budget = get_request_budget(hass, requests_per_hour)
+        budget.add(position_shares)
+    coordinator = AvanzaStockCoordinator(
+        hass,
+        session,
+        get_request_limiter(
+            hass,
+            config.get(CONF_MAX_CONCURRENT_REQUESTS),
+            config.get(CONF_REQUESTS_PER_SECOND),
+        ),
+        await async_get_storage(hass),
+        stocks,
+        conversions,
+        domain_data[DATA_CONVERSION_CACHE],
+        config.get(CONF_CONVERSION_CURRENCY_TTL),
+        config.get(CONF_SCAN_INTERVAL, SCAN_INTERVAL),
+        config.get(CONF_MARKET_OPEN_INTERVAL),
+        config.get(CONF_RETRIES),
+        config.get(CONF_CIRCUIT_BREAKER_THRESHOLD),
+        config.get(CONF_CIRCUIT_BREAKER_COOL_DOWN),
+        config.get(CONF_PUSH_URL),
+        get_history_store(hass) if config.get(CONF_HISTORY) else None,
+        compile_snapshot_fields(monitored_conditions),
+        alerts,
+        budget,
+    )
+    coordinator.restore()
     entities = []
+    holdings = []
+    names = {}
     if isinstance(stock, int):
         name = config.get(CONF_NAME)
         shares = config.get(CONF_SHARES)
@@ -105,10 +314,11 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
         conversion_currency = config.get(CONF_CONVERSION_CURRENCY)
         invert_conversion_currency = config.get(CONF_INVERT_CONVERSION_CURRENCY)
         currency = config.get(CONF_CURRENCY)
+        convert_to = config.get(CONF_CONVERT_TO)
         if name is None:
             name = DEFAULT_NAME + " " + str(stock)
         entities.append(
-            AvanzaStockSensor(
+            sensor_class(
                 hass,
                 stock,
                 name,
@@ -119,10 +329,29 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
                 invert_conversion_currency,
                 currency,
                 monitored_conditions,
-                session,
+                coordinator,
                 show_trending_icon,
+                min_price_change,
+                min_change_percent,
+                indicators,
+                convert_to,
+                metric_sensors,
+                async_add_entities,
             )
         )
+        if shares is not None:
+            holdings.append(
+                Holding(
+                    name,
+                    stock,
+                    shares,
+                    purchase_price,
+                    (conversion_currency, invert_conversion_currency),
+                    currency,
+                    convert_to,
+                )
+            )
+        names.setdefault(stock, name)
         _LOGGER.debug("Tracking %s [%d] using Avanza" % (name, stock))
     else:
         for s in stock:
@@ -136,8 +365,9 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
             conversion_currency = s.get(CONF_CONVERSION_CURRENCY)
             invert_conversion_currency = s.get(CONF_INVERT_CONVERSION_CURRENCY)
             currency = s.get(CONF_CURRENCY)
+            convert_to = s.get(CONF_CONVERT_TO, config.get(CONF_CONVERT_TO))
             entities.append(
-                AvanzaStockSensor(
+                sensor_class(
                     hass,
                     id,
                     name,
@@ -148,17 +378,99 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
                     invert_conversion_currency,
                     currency,
                     monitored_conditions,
-                    session,
+                    coordinator,
                     show_trending_icon,
+                    min_price_change,
+                    min_change_percent,
+                    indicators,
+                    convert_to,
+                    metric_sensors,
+                    async_add_entities,
                 )
             )
+            if shares is not None:
+                holdings.append(
+                    Holding(
+                        name,
+                        id,
+                        shares,
+                        purchase_price,
+                        (conversion_currency, invert_conversion_currency),
+                        currency,
+                        convert_to,
+                    )
+                )
+            names.setdefault(id, name)
             _LOGGER.debug("Tracking %s [%d] using Avanza" % (name, id))
-    async_add_entities(entities, True)
+    async_setup_services(hass, coordinator, dict(names))
+    if config.get(CONF_HISTORY):
+        async_setup_history_service(hass)
+    portfolio = config.get(CONF_PORTFOLIO)
+    if portfolio is not None:
+        entities.append(AvanzaPortfolioSensor(portfolio, holdings, coordinator))
+        _LOGGER.debug("Tracking portfolio %s using Avanza", portfolio)
+    if config.get(CONF_TELEMETRY):
+        for conversion_currency, _ in conversions:
+            if conversion_currency:
+                names.setdefault(
+                    conversion_currency, DEFAULT_NAME + " " + str(conversion_currency)
+                )
+        # One sensor per id for all platforms, as the telemetry is shared
+        telemetry_sensors = domain_data.setdefault(DATA_TELEMETRY_SENSORS, set())
+        for id, name in names.items():
+            if id and id not in telemetry_sensors:
+                telemetry_sensors.add(id)
+                entities.append(AvanzaStockTelemetrySensor(id, name, coordinator))
+    async_add_entities(entities)
+    hass.async_create_task(coordinator.async_refresh())
+    coordinator.start_push()
+
+
+def _register_alerts(hass, registry, stock, alerts):
+    """Add the alert thresholds of a stock, return the registry if in use."""
+    if not alerts or not stock:
+        return registry
+    registry = get_alert_registry(hass)
+    for metric in (CONF_PRICE, CONF_CHANGE_PERCENT):
+        for threshold in alerts[metric]:
+            registry.add(stock, metric, threshold)
+    return registry
+
+
+def _unrecorded_attribute_set(recorded_groups, indicators):
+    """Return the attributes of the groups that are not recorded."""
+    unrecorded = set()
+    for group, attributes in RECORDED_ATTRIBUTE_GROUPS.items():
+        if group not in recorded_groups:
+            unrecorded.update(attributes)
+    if indicators and "indicators" not in recorded_groups:
+        unrecorded.update(IndicatorEngine(indicators).attributes())
+    return frozenset(unrecorded)
 
 
-class AvanzaStockSensor(SensorEntity):
+@functools.cache
+def _sensor_class(sensor_class, unrecorded_attributes):
+    """Return a sensor class keeping unrecorded_attributes out of the recorder.
+
+    Home Assistant takes the unrecorded attributes from the entity class, so
+    a subclass is made for every set that differs from the default.
+    """
+    if unrecorded_attributes == sensor_class._unrecorded_attributes:
+        return sensor_class
+    return type(
+        sensor_class.__name__,
+        (sensor_class,),
+        {"_unrecorded_attributes": unrecorded_attributes},
+    )
+
+
+class AvanzaStockSensor(CoordinatorEntity, SensorEntity):
     """Representation of a Avanza Stock sensor."""
 
+    _unrecorded_attributes = _unrecorded_attribute_set(
+        DEFAULT_RECORDED_ATTRIBUTES, None
+    )
+
     def __init__(
         self,
         hass,
@@ -171,10 +483,21 @@ class AvanzaStockSensor(SensorEntity):
         invert_conversion_currency,
         currency,
         monitored_conditions,
-        session,
+        coordinator,
         show_trending_icon,
+        min_price_change,
+        min_change_percent,
+        indicators=None,
+        convert_to=None,
+        metric_sensors=None,
+        add_entities=None,
     ):
-        """Initialize a Avanza Stock sensor."""
+        """Initialize a Avanza Stock sensor.
+
+        The attribute groups in metric_sensors are left to sensors of their
+        own, added with add_entities once a group has values.
+        """
+        super().__init__(coordinator)
         self._hass = hass
         self._stock = stock
         self._name = name
@@ -184,9 +507,36 @@ class AvanzaStockSensor(SensorEntity):
         self._conversion_currency = conversion_currency
         self._invert_conversion_currency = invert_conversion_currency
         self._currency = currency
+        self._convert_to = convert_to
         self._monitored_conditions = monitored_conditions
-        self._session = session
+        self._attribute_plan = compile_attribute_plan(monitored_conditions, shares)
+        self._currency_attributes = tuple(
+            attribute
+            for attribute, _, is_currency in self._attribute_plan
+            if is_currency
+        )
+        self._indicators = None
+        if indicators:
+            self._indicators = IndicatorEngine(indicators)
+            self._currency_attributes += self._indicators.currency_attributes
+        self._indicator_key = None
+        self._metric_groups = {}
+        for group in metric_sensors or ():
+            if group == "indicators":
+                if self._indicators is not None:
+                    attributes = list(self._indicators.attributes())
+                    self._metric_groups[group] = (attributes, attributes)
+            else:
+                self._metric_groups[group] = (
+                    RECORDED_ATTRIBUTE_GROUPS[group],
+                    METRIC_SENSOR_STATES[group],
+                )
+        self._metric_sensors = {}
+        self._add_entities = add_entities
         self._show_trending_icon = show_trending_icon
+        self._min_price_change = min_price_change
+        self._min_change_percent = min_change_percent
+        self._written = (None, None)
         self._icon = "mdi:cash"
         self._state = 0
         self._state_attributes = {}
@@ -223,6 +573,11 @@ class AvanzaStockSensor(SensorEntity):
         """Return the unique id."""
         return f"{self._stock}_{self._name}_stock"
 
+    @property
+    def available(self):
+        """Return True if there is data for the stock, even if stale."""
+        return self._stock == 0 or self._stock in (self.coordinator.data or {})
+
     @property
     def state_class(self):
         """Return the state class."""
@@ -233,9 +588,50 @@ class AvanzaStockSensor(SensorEntity):
         """Return the device class."""
         return SensorDeviceClass.MONETARY
 
-    async def async_update(self):
-        """Update state and attributes."""
-        data_conversion_currency = None
+    async def async_added_to_hass(self):
+        """Populate state from the coordinator when added to hass."""
+        await super().async_added_to_hass()
+        self._update_from_coordinator()
+        self._should_write_state()
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Handle updated data from the coordinator."""
+        if (
+            self._stock not in self.coordinator.updated_stocks
+            and (self._conversion_currency, self._invert_conversion_currency)
+            not in self.coordinator.updated_conversions
+            and not (self._convert_to and self.coordinator.updated_conversions)
+        ):
+            return
+        self._update_from_coordinator()
+        if self._should_write_state():
+            self.async_write_ha_state()
+
+    def _should_write_state(self):
+        """Return True if the state moved enough since it was last written."""
+        stale = self._state_attributes.get(ATTR_STALE)
+        written_state, written_stale = self._written
+        if (
+            written_state is not None
+            and self._state is not None
+            and written_stale == stale
+        ):
+            delta = abs(self._state - written_state)
+            if self._min_price_change is not None and delta < self._min_price_change:
+                return False
+            if (
+                self._min_change_percent is not None
+                and written_state
+                and 100 * delta / abs(written_state) < self._min_change_percent
+            ):
+                return False
+        self._written = (self._state, stale)
+        return True
+
+    def _update_from_coordinator(self):
+        """Update state and attributes from the coordinator snapshot."""
+        conversion_rate = None
         if self._stock == 0:  # Non trackable, i.e. manual
             data = {
                 "name": self._name.split(" ", 1)[1],
@@ -260,13 +656,14 @@ class AvanzaStockSensor(SensorEntity):
                 },
             }
         else:
-            data = await pyavanza.get_stock_async(self._session, self._stock)
-            if data["type"] == pyavanza.InstrumentType.ExchangeTradedFund:
-                data = await pyavanza.get_etf_async(self._session, self._stock)
+            snapshots = self.coordinator.data or {}
+            data = snapshots.get(self._stock)
             if self._conversion_currency:
-                data_conversion_currency = await pyavanza.get_stock_async(
-                    self._session, self._conversion_currency
+                conversion_rate = self.coordinator.conversion_rates.get(
+                    (self._conversion_currency, self._invert_conversion_currency)
                 )
+            elif self._convert_to is not None and data:
+                conversion_rate = self._cross_rate(data)
         if data:
             # Store previous close price for trending calculation
             if "quote" in data and "last" in data["quote"] and self._stock != 0:
@@ -296,111 +693,85 @@ class AvanzaStockSensor(SensorEntity):
             self._update_unit_of_measurement(data)
             self._update_state_attributes(data)
             self._update_trending_and_icon(data)
-            if data_conversion_currency:
-                self._update_conversion_rate(data_conversion_currency)
+            self._update_indicators(data)
+            if self._stock != 0:
+                self._update_freshness()
+            if conversion_rate:
+                self._update_conversion_rate(conversion_rate)
             if self._currency:
                 self._unit_of_measurement = self._currency
+            if self._metric_groups:
+                self._update_metric_sensors()
 
-    def _update_state(self, data):
-        self._state = data["quote"]["last"]
+    def _update_metric_sensors(self):
+        """Move the attribute groups over to their own sensors.
 
-    def _update_unit_of_measurement(self, data):
-        self._unit_of_measurement = data["listing"]["currency"]
+        A sensor is only added once its group has a value that is known.
+        """
+        attributes = self._state_attributes
+        for group, (keys, state_keys) in self._metric_groups.items():
+            values = {key: attributes.pop(key) for key in keys if key in attributes}
+            sensor = self._metric_sensors.get(group)
+            if sensor is None:
+                if all(value in (None, "unknown") for value in values.values()):
+                    continue
+                sensor = self._metric_sensors[group] = _sensor_class(
+                    AvanzaStockMetricSensor, self._unrecorded_attributes
+                )(self._stock, self._name, group, state_keys)
+                self._add_entities([sensor])
+            sensor.async_update_values(values)
 
-    def _update_state_attributes(self, data):
-        for condition in self._monitored_conditions:
-            if condition in MONITORED_CONDITIONS_KEYRATIOS:
-                self._update_key_ratios(data, condition)
-            elif condition in MONITORED_CONDITIONS_COMPANY:
-                self._update_company(data, condition)
-            elif condition in MONITORED_CONDITIONS_QUOTE:
-                self._update_quote(data, condition)
-            elif condition in MONITORED_CONDITIONS_LISTING:
-                self._update_listing(data, condition)
-            elif condition in MONITORED_CONDITIONS_PRICE:
-                self._update_price(data, condition)
-            elif condition == "dividends":
-                self._update_dividends(data)
-            elif condition == "id":
-                self._state_attributes[condition] = data.get("orderbookId", None)
-            else:
-                self._state_attributes[condition] = data.get(condition, None)
-
-            if condition == "change":
-                for change, price in CHANGE_PRICE_MAPPING:
-                    if price in data["historicalClosingPrices"]:
-                        self._state_attributes[change] = round(
-                            data["quote"]["last"]
-                            - data["historicalClosingPrices"][price],
-                            5,
-                        )
-                    else:
-                        self._state_attributes[change] = "unknown"
-
-                if self._shares is not None:
-                    for change, price in TOTAL_CHANGE_PRICE_MAPPING:
-                        if price in data["historicalClosingPrices"]:
-                            self._state_attributes[change] = round(
-                                self._shares
-                                * (
-                                    data["quote"]["last"]
-                                    - data["historicalClosingPrices"][price]
-                                ),
-                                5,
-                            )
-                        else:
-                            self._state_attributes[change] = "unknown"
-
-            if condition == "changePercent":
-                for change, price in CHANGE_PERCENT_PRICE_MAPPING:
-                    if price in data["historicalClosingPrices"]:
-                        self._state_attributes[change] = round(
-                            100
-                            * (
-                                data["quote"]["last"]
-                                - data["historicalClosingPrices"][price]
-                            )
-                            / data["historicalClosingPrices"][price],
-                            3,
-                        )
-                    else:
-                        self._state_attributes[change] = "unknown"
-
-        if self._shares is not None:
-            self._state_attributes["shares"] = self._shares
-            self._state_attributes["totalValue"] = round(
-                self._shares * data["quote"]["last"], 5
-            )
-            self._state_attributes["totalChange"] = round(
-                self._shares * data["quote"]["change"], 5
+    def _cross_rate(self, data):
+        """Return the rate from the currency of the stock into convert_to."""
+        source = self._currency or data["listing"]["currency"]
+        if source == self._convert_to:
+            return None
+        conversion_rate = self.coordinator.currency_graph.get(source, self._convert_to)
+        if conversion_rate is None:
+            _LOGGER.debug(
+                "No conversion rate from %s to %s for %s",
+                source,
+                self._convert_to,
+                self._name,
             )
+        return conversion_rate
 
-        self._update_profit_loss(data["quote"]["last"])
+    def _update_indicators(self, data):
+        """Add the price to the indicators if it is a new one."""
+        if self._indicators is None:
+            return
+        quote = data["quote"]
+        key = (quote.get("timeOfLast") or quote.get("updated"), quote["last"])
+        if key != self._indicator_key:
+            self._indicator_key = key
+            self._indicators.update(quote["last"])
+        self._state_attributes.update(self._indicators.attributes())
 
-    def _update_key_ratios(self, data, attr):
-        key_ratios = data.get("keyRatios", {})
-        self._state_attributes[attr] = key_ratios.get(attr, None)
+    def _update_freshness(self):
+        last_changed = self.coordinator.last_changed.get(self._stock)
+        self._state_attributes[ATTR_STALE] = (
+            self._stock in self.coordinator.stale_stocks
+        )
+        self._state_attributes[ATTR_LAST_CHANGED] = (
+            last_changed.isoformat() if last_changed is not None else None
+        )
 
-    def _update_company(self, data, attr):
-        company = data.get("company", {})
-        self._state_attributes[attr] = company.get(attr, None)
+    def _update_state(self, data):
+        self._state = data["quote"]["last"]
 
-    def _update_quote(self, data, attr):
-        quote = data.get("quote", {})
-        self._state_attributes[attr] = quote.get(attr, None)
+    def _update_unit_of_measurement(self, data):
+        self._unit_of_measurement = data["listing"]["currency"]
 
-    def _update_listing(self, data, attr):
-        listing = data.get("listing", {})
-        if attr == "marketPlace":
-            self._state_attributes[attr] = listing.get("marketPlaceName", None)
-        elif attr == "flagCode":
-            self._state_attributes[attr] = listing.get("countryCode", None)
-        else:
-            self._state_attributes[attr] = listing.get(attr, None)
+    def _update_state_attributes(self, data):
+        attributes = self._state_attributes
+        last = data["quote"]["last"]
+        prices = data.get("historicalClosingPrices") or {}
+        for attribute, extract, _ in self._attribute_plan:
+            value = extract(data, last, prices)
+            if value is not SKIP:
+                attributes[attribute] = value
 
-    def _update_price(self, data, attr):
-        prices = data.get("historicalClosingPrices", {})
-        self._state_attributes[attr] = prices.get(PRICE_MAPPING[attr], None)
+        self._update_profit_loss(last)
 
     def _update_profit_loss(self, price):
         if self._purchase_date is not None:
@@ -419,39 +790,17 @@ class AvanzaStockSensor(SensorEntity):
                     self._shares * (price - self._purchase_price), 5
                 )
 
-    def _update_conversion_rate(self, data):
-        rate = data["quote"]["last"]
-        if self._invert_conversion_currency:
-            rate = 1.0 / rate
+    def _update_conversion_rate(self, conversion_rate):
+        rate = conversion_rate.rate
         self._state = round(self._state * rate, 5)
-        if self._invert_conversion_currency:
-            self._unit_of_measurement = data["name"].split("/")[0]
-        else:
-            self._unit_of_measurement = data["name"].split("/")[1]
-        for attribute in self._state_attributes:
-            if (
-                attribute in CURRENCY_ATTRIBUTE
-                and self._state_attributes[attribute] is not None
-                and self._state_attributes[attribute] != "unknown"
-            ):
-                self._state_attributes[attribute] = round(
-                    self._state_attributes[attribute] * rate, 5
-                )
+        self._unit_of_measurement = conversion_rate.unit
+        attributes = self._state_attributes
+        for attribute in self._currency_attributes:
+            value = attributes.get(attribute)
+            if value is not None and value != "unknown":
+                attributes[attribute] = round(value * rate, 5)
         self._update_profit_loss(self._state)
 
-    def _update_dividends(self, data):
-        if "keyIndicators" not in data:
-            return
-        if "dividend" not in data["keyIndicators"]:
-            return
-
-        dividend = data["keyIndicators"]["dividend"]
-        for dividend_condition in MONITORED_CONDITIONS_DIVIDENDS:
-            if dividend_condition not in dividend:
-                continue
-            attribute = "dividend_{}".format(dividend_condition)
-            self._state_attributes[attribute] = dividend[dividend_condition]
-
     def _calc_trending_state(self) -> str | None:
         """Return the trending state for the stock."""
         if self._state is None or self._previous_close is None:
@@ -478,3 +827,238 @@ class AvanzaStockSensor(SensorEntity):
         else:
             # Fall back to default cash icon
             self._icon = "mdi:cash"
+
+
+class AvanzaStockMetricSensor(SensorEntity):
+    """Representation of an attribute group of a Avanza Stock sensor.
+
+    Its values are set by the stock sensor, the state is written only when
+    they changed.
+    """
+
+    _attr_should_poll = False
+    _unrecorded_attributes = AvanzaStockSensor._unrecorded_attributes
+
+    def __init__(self, stock, name, group, state_keys):
+        """Initialize a Avanza Stock metric sensor."""
+        self._stock = stock
+        self._stock_name = name
+        self._group = group
+        self._name = f"{name} {group.replace('_', ' ')}"
+        self._state_keys = state_keys
+        self._state = None
+        self._state_attributes = {}
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return self._name
+
+    @property
+    def icon(self):
+        """Icon to use in the frontend, if any."""
+        return "mdi:chart-box-outline"
+
+    @property
+    def state(self):
+        """Return the first value of the state keys the group has."""
+        return self._state
+
+    @property
+    def extra_state_attributes(self):
+        """Return the values of the group."""
+        return self._state_attributes
+
+    @property
+    def unique_id(self):
+        """Return the unique id."""
+        return f"{self._stock}_{self._stock_name}_{self._group}"
+
+    @callback
+    def async_update_values(self, values):
+        """Update the values of the group, write the state if they changed."""
+        if values == self._state_attributes:
+            return
+        self._state_attributes = values
+        self._state = next(
+            (values[key] for key in self._state_keys if key in values), None
+        )
+        if self.hass is not None:
+            self.async_write_ha_state()
+
+
+class AvanzaPortfolioSensor(CoordinatorEntity, SensorEntity):
+    """Representation of the aggregated value of all holdings."""
+
+    _unrecorded_attributes = frozenset({"weights", "excluded"})
+
+    def __init__(self, name, holdings, coordinator):
+        """Initialize a Avanza portfolio sensor."""
+        super().__init__(coordinator)
+        self._name = name
+        self._holdings = holdings
+        self._stocks = frozenset(holding.stock for holding in holdings)
+        self._state = None
+        self._state_attributes = {}
+        self._unit_of_measurement = None
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return self._name
+
+    @property
+    def icon(self):
+        """Icon to use in the frontend, if any."""
+        return "mdi:briefcase-outline"
+
+    @property
+    def state(self):
+        """Return the state of the device."""
+        return self._state
+
+    @property
+    def extra_state_attributes(self):
+        """Return the state attributes of the sensor."""
+        return self._state_attributes
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement."""
+        return self._unit_of_measurement
+
+    @property
+    def unique_id(self):
+        """Return the unique id."""
+        return f"{self._name}_portfolio"
+
+    @property
+    def available(self):
+        """Return True if there is data for any holding."""
+        return self._unit_of_measurement is not None
+
+    @property
+    def state_class(self):
+        """Return the state class."""
+        return SensorStateClass.MEASUREMENT
+
+    @property
+    def device_class(self):
+        """Return the device class."""
+        return SensorDeviceClass.MONETARY
+
+    async def async_added_to_hass(self):
+        """Populate state from the coordinator when added to hass."""
+        await super().async_added_to_hass()
+        self._update_from_coordinator()
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Handle updated data from the coordinator."""
+        # Any conversion rate may be part of a cross rate of a holding
+        if (
+            self._stocks.isdisjoint(self.coordinator.updated_stocks)
+            and not self.coordinator.updated_conversions
+        ):
+            return
+        self._update_from_coordinator()
+        self.async_write_ha_state()
+
+    def _update_from_coordinator(self):
+        """Update state and attributes from all holdings at once."""
+        (
+            self._state,
+            self._unit_of_measurement,
+            self._state_attributes,
+        ) = compute_portfolio(
+            self._holdings,
+            self.coordinator.data or {},
+            self.coordinator.conversion_rates,
+            self.coordinator.currency_graph,
+        )
+
+
+class AvanzaStockTelemetrySensor(CoordinatorEntity, SensorEntity):
+    """Representation of the fetch telemetry of a single orderbook id."""
+
+    _unrecorded_attributes = frozenset({"endpoints", "latency_histogram"})
+
+    def __init__(self, stock, name, coordinator):
+        """Initialize a Avanza Stock telemetry sensor."""
+        super().__init__(coordinator)
+        self._stock = stock
+        self._name = f"{name} fetch latency"
+        self._requests = None
+        self._state = None
+        self._state_attributes = {}
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return self._name
+
+    @property
+    def icon(self):
+        """Icon to use in the frontend, if any."""
+        return "mdi:timer-outline"
+
+    @property
+    def state(self):
+        """Return the mean latency of the requests in milliseconds."""
+        return self._state
+
+    @property
+    def extra_state_attributes(self):
+        """Return the state attributes of the sensor."""
+        return self._state_attributes
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement."""
+        return UnitOfTime.MILLISECONDS
+
+    @property
+    def unique_id(self):
+        """Return the unique id."""
+        return f"{self._stock}_telemetry"
+
+    @property
+    def available(self):
+        """Return True once the orderbook id has been requested."""
+        return self._state is not None
+
+    @property
+    def state_class(self):
+        """Return the state class."""
+        return SensorStateClass.MEASUREMENT
+
+    @property
+    def device_class(self):
+        """Return the device class."""
+        return SensorDeviceClass.DURATION
+
+    @property
+    def entity_category(self):
+        """Return the entity category."""
+        return EntityCategory.DIAGNOSTIC
+
+    async def async_added_to_hass(self):
+        """Populate state from the coordinator when added to hass."""
+        await super().async_added_to_hass()
+        self._update_from_coordinator()
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Handle updated data from the coordinator."""
+        if self._update_from_coordinator():
+            self.async_write_ha_state()
+
+    def _update_from_coordinator(self):
+        """Update from the telemetry, return True if anything was requested."""
+        telemetry = self.coordinator.telemetry.get(self._stock)
+        if telemetry is None or telemetry.requests == self._requests:
+            return False
+        self._requests = telemetry.requests
+        self._state = round(1000 * telemetry.mean_latency, 1)
+        self._state_attributes = telemetry.as_dict(dt_util.utcnow())
+        return True
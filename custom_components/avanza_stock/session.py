@@ -0,0 +1,51 @@
+"""Shared HTTP session for avanza_stock."""
+
+import aiohttp
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE
+from homeassistant.helpers.json import json_dumps
+from homeassistant.util import ssl as ssl_util
+
+from custom_components.avanza_stock.const import DATA_SESSION, DOMAIN
+
+# Enough for the in-flight requests and a push connection, the shared
+# request limiter does the actual limiting
+CONNECTIONS_PER_HOST = 20
+# Long enough to reuse connections between the requests of a cycle
+KEEPALIVE_TIMEOUT = 60
+DNS_CACHE_TTL = 300
+
+
+def get_session(hass):
+    """Return the session shared by every platform entry.
+
+    The session keeps a pool of connections to Avanza alive and caches DNS
+    lookups, so a cycle mostly reuses connections instead of opening new
+    ones. It is closed when Home Assistant closes.
+    """
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_SESSION not in domain_data:
+        connector = aiohttp.TCPConnector(
+            ssl=ssl_util.get_default_context(),
+            limit_per_host=CONNECTIONS_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            enable_cleanup_closed=True,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            headers={
+                aiohttp.hdrs.USER_AGENT: SERVER_SOFTWARE,
+                aiohttp.hdrs.ACCEPT_ENCODING: "gzip, deflate",
+            },
+            json_serialize=json_dumps,
+        )
+        domain_data[DATA_SESSION] = session
+
+        async def _async_close_session(event):
+            """Close the session and its connections."""
+            domain_data.pop(DATA_SESSION, None)
+            await session.close()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_session)
+    return domain_data[DATA_SESSION]
@@ -0,0 +1,81 @@
+"""Slim snapshots of the fetched data for avanza_stock.
+
+The market guide returns far more than the sensors use, like the company
+description and order depth. Only the keys read by the monitored conditions
+and by the integration itself are kept, in memory as well as in storage.
+"""
+
+from custom_components.avanza_stock.attributes import LISTING_MAPPING
+from custom_components.avanza_stock.const import (
+    MONITORED_CONDITIONS_COMPANY,
+    MONITORED_CONDITIONS_KEYRATIOS,
+    MONITORED_CONDITIONS_LISTING,
+    MONITORED_CONDITIONS_PRICE,
+    MONITORED_CONDITIONS_QUOTE,
+)
+
+# Keys kept whatever the monitored conditions, the keys of a section or None
+# to keep a top-level value as is
+REQUIRED_FIELDS = {
+    "name": None,
+    "orderbookId": None,
+    "type": None,
+    "historicalClosingPrices": None,
+    "listing": ("currency", "countryCode"),
+    "quote": ("last", "change", "changePercent", "updated", "timeOfLast"),
+}
+
+
+def compile_snapshot_fields(monitored_conditions):
+    """Return the keys to keep for the monitored conditions."""
+    fields = {
+        key: None if keys is None else set(keys)
+        for key, keys in REQUIRED_FIELDS.items()
+    }
+    for condition in monitored_conditions:
+        if condition in MONITORED_CONDITIONS_KEYRATIOS:
+            fields.setdefault("keyRatios", set()).add(condition)
+        elif condition in MONITORED_CONDITIONS_COMPANY:
+            fields.setdefault("company", set()).add(condition)
+        elif condition in MONITORED_CONDITIONS_QUOTE:
+            fields["quote"].add(condition)
+        elif condition in MONITORED_CONDITIONS_LISTING:
+            fields["listing"].add(LISTING_MAPPING.get(condition, condition))
+        elif condition == "dividends":
+            fields.setdefault("keyIndicators", set()).add("dividend")
+        elif condition not in MONITORED_CONDITIONS_PRICE and condition != "id":
+            fields.setdefault(condition, None)
+    return {
+        key: None if keys is None else tuple(sorted(keys))
+        for key, keys in fields.items()
+    }
+
+
+def covers_fields(kept, fields):
+    """Return True if a snapshot that kept the fields kept has all of fields."""
+    if kept is None:
+        return False
+    for key, keys in fields.items():
+        if key not in kept:
+            return False
+        if kept[key] is not None and (keys is None or not set(keys) <= set(kept[key])):
+            return False
+    return True
+
+
+def slim_section(section, keys):
+    """Return the keys of a section that are kept."""
+    return {key: section[key] for key in keys if key in section}
+
+
+def slim_snapshot(data, fields):
+    """Return the fetched data with only the kept keys."""
+    snapshot = {}
+    for key, keys in fields.items():
+        value = data.get(key)
+        if value is None:
+            continue
+        if keys is not None and isinstance(value, dict):
+            value = slim_section(value, keys)
+        snapshot[key] = value
+    return snapshot
@@ -0,0 +1,136 @@
+"""Long-term statistics imported from the price charts for avanza_stock."""
+
+import asyncio
+import logging
+from datetime import timedelta
+
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+)
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from custom_components.avanza_stock.const import (
+    ATTR_IDS,
+    DATA_COORDINATORS,
+    DOMAIN,
+    SERVICE_IMPORT_STATISTICS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+IMPORT_STATISTICS_SCHEMA = vol.Schema(
+    {vol.Optional(ATTR_IDS): vol.All(cv.ensure_list, [cv.positive_int])}
+)
+
+
+def statistic_id(stock):
+    """Return the id of the external statistic of an orderbook id."""
+    return f"{DOMAIN}:{stock}"
+
+
+def _statistics(chart, after, now):
+    """Return the hourly statistics of the days in a chart after a timestamp.
+
+    Every day becomes a single row at the hour it starts. The day that has
+    not ended yet is left out, as its prices still change.
+    """
+    rows = {}
+    for point in chart:
+        start = dt_util.utc_from_timestamp(point["timestamp"] / 1000).replace(
+            minute=0, second=0, microsecond=0
+        )
+        if after is not None and start.timestamp() <= after:
+            continue
+        if start + timedelta(days=1) > now:
+            continue
+        close = point["close"]
+        rows[start] = {
+            "start": start,
+            "mean": close,
+            "min": point.get("low", close),
+            "max": point.get("high", close),
+            "state": close,
+        }
+    return [rows[start] for start in sorted(rows)]
+
+
+async def async_import_chart_statistics(hass, coordinator, stock, name):
+    """Import the price chart of an orderbook id into the statistics.
+
+    The import resumes after the last imported day and all new days are
+    added in a single batch. Return the number of days imported.
+    """
+    statistic = statistic_id(stock)
+    last = await get_instance(hass).async_add_executor_job(
+        get_last_statistics, hass, 1, statistic, False, {"mean"}
+    )
+    after = last[statistic][0]["start"] if last.get(statistic) else None
+    chart = await coordinator.async_fetch_chart(stock)
+    rows = _statistics(chart, after, dt_util.utcnow())
+    if not rows:
+        return 0
+    snapshot = (coordinator.data or {}).get(stock) or {}
+    metadata = {
+        "has_mean": True,
+        "has_sum": False,
+        "name": name,
+        "source": DOMAIN,
+        "statistic_id": statistic,
+        "unit_of_measurement": (snapshot.get("listing") or {}).get("currency"),
+    }
+    async_add_external_statistics(hass, metadata, rows)
+    return len(rows)
+
+
+async def _async_handle_import_statistics(hass, call):
+    """Import the statistics of the requested or all configured ids."""
+    if "recorder" not in hass.config.components:
+        raise HomeAssistantError("The recorder is needed to import statistics")
+    ids = call.data.get(ATTR_IDS)
+    jobs = {}
+    for coordinator, names in hass.data[DOMAIN][DATA_COORDINATORS]:
+        for stock, name in names.items():
+            if stock and (ids is None or stock in ids):
+                jobs.setdefault(stock, (coordinator, name))
+    for stock in set(ids or ()) - set(jobs):
+        _LOGGER.warning("Not importing statistics of %d, it is not configured", stock)
+    stocks = list(jobs)
+    results = await asyncio.gather(
+        *(
+            async_import_chart_statistics(hass, jobs[stock][0], stock, jobs[stock][1])
+            for stock in stocks
+        ),
+        return_exceptions=True,
+    )
+    imported = 0
+    for stock, result in zip(stocks, results):
+        if isinstance(result, Exception):
+            _LOGGER.warning("Failed to import statistics of %d: %s", stock, result)
+        else:
+            imported += result
+    _LOGGER.info("Imported %d days of statistics of %d ids", imported, len(stocks))
+
+
+@callback
+def async_setup_services(hass, coordinator, names):
+    """Register the import service once and make the ids of a coordinator known."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    domain_data.setdefault(DATA_COORDINATORS, []).append((coordinator, names))
+    if hass.services.has_service(DOMAIN, SERVICE_IMPORT_STATISTICS):
+        return
+
+    async def async_import_statistics(call):
+        await _async_handle_import_statistics(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_IMPORT_STATISTICS,
+        async_import_statistics,
+        schema=IMPORT_STATISTICS_SCHEMA,
+    )
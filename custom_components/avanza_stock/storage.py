@@ -0,0 +1,111 @@
+"""Persistent storage for avanza_stock."""
+
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from custom_components.avanza_stock.const import DATA_STORAGE, DOMAIN
+
+STORAGE_KEY = DOMAIN
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+
+async def async_get_storage(hass):
+    """Return the integration-wide storage, loading it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_STORAGE not in domain_data:
+        storage = AvanzaStockStorage(hass)
+        domain_data[DATA_STORAGE] = hass.async_create_task(storage.async_load())
+    return await domain_data[DATA_STORAGE]
+
+
+class AvanzaStockStorage:
+    """Remember what has been learned about instruments between restarts."""
+
+    def __init__(self, hass):
+        """Initialize the storage."""
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._instrument_types = {}
+        self._snapshots = {}
+        self._conversion_rates = {}
+
+    async def async_load(self):
+        """Load stored data and return self."""
+        data = await self._store.async_load() or {}
+        self._instrument_types = data.get("instrument_types", {})
+        self._snapshots = data.get("snapshots", {})
+        self._conversion_rates = data.get("conversion_rates", {})
+        return self
+
+    def get_instrument_type(self, stock):
+        """Return the known instrument type of an orderbook id."""
+        return self._instrument_types.get(str(stock))
+
+    @callback
+    def async_set_instrument_type(self, stock, instrument_type):
+        """Remember the instrument type of an orderbook id, None forgets it."""
+        if self._instrument_types.get(str(stock)) == instrument_type:
+            return
+        if instrument_type is None:
+            del self._instrument_types[str(stock)]
+        else:
+            self._instrument_types[str(stock)] = instrument_type
+        self._async_schedule_save()
+
+    def get_snapshot(self, stock):
+        """Return the last stored snapshot, when it was fetched and its fields.
+
+        The fields are None for a snapshot stored without them.
+        """
+        snapshot = self._snapshots.get(str(stock))
+        if snapshot is None:
+            return None, None, None
+        return (
+            snapshot["data"],
+            dt_util.parse_datetime(snapshot["fetched"]),
+            snapshot.get("fields"),
+        )
+
+    @callback
+    def async_set_snapshot(self, stock, data, fetched, fields):
+        """Store the last snapshot of an orderbook id and the fields it kept."""
+        self._snapshots[str(stock)] = {
+            "data": data,
+            "fetched": fetched.isoformat(),
+            "fields": fields,
+        }
+        self._async_schedule_save()
+
+    def get_conversion_rate(self, conversion_currency, invert):
+        """Return the last stored conversion rate, its unit and source unit."""
+        rate = self._conversion_rates.get(f"{conversion_currency}_{int(invert)}")
+        if rate is None:
+            return None, None, None
+        return rate["rate"], rate["unit"], rate.get("source")
+
+    @callback
+    def async_set_conversion_rate(
+        self, conversion_currency, invert, rate, unit, source
+    ):
+        """Store the last conversion rate."""
+        self._conversion_rates[f"{conversion_currency}_{int(invert)}"] = {
+            "rate": rate,
+            "unit": unit,
+            "source": source,
+        }
+        self._async_schedule_save()
+
+    @callback
+    def _async_schedule_save(self):
+        """Schedule saving the stored data."""
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self):
+        """Return the data to store."""
+        return {
+            "instrument_types": self._instrument_types,
+            "snapshots": self._snapshots,
+            "conversion_rates": self._conversion_rates,
+        }
@@ -0,0 +1,90 @@
+"""Fetch telemetry for avanza_stock."""
+
+from bisect import bisect_left
+from collections import Counter
+
+from custom_components.avanza_stock.const import DATA_TELEMETRY, DOMAIN
+
+# Upper bounds in seconds of the latency histogram buckets, the last bucket
+# counts everything slower
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_fetch_telemetry(hass):
+    """Return the integration-wide fetch telemetry by orderbook id."""
+    return hass.data.setdefault(DOMAIN, {}).setdefault(DATA_TELEMETRY, {})
+
+
+class FetchTelemetry:
+    """Counters of the requests made for a single orderbook id."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.endpoints = Counter()
+        self.last_latency = None
+        self.last_success = None
+        self.last_error = None
+
+    def _record(self, endpoint, latency):
+        self.requests += 1
+        self.endpoints[endpoint] += 1
+        self.latency_sum += latency
+        self.latency_histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        self.last_latency = latency
+
+    def record_success(self, endpoint, latency, size, now):
+        """Record a successful request of size bytes."""
+        self._record(endpoint, latency)
+        self.bytes += size
+        self.last_success = now
+
+    def record_error(self, endpoint, latency, error):
+        """Record a failed request."""
+        self._record(endpoint, latency)
+        self.errors += 1
+        self.last_error = repr(error)
+
+    def record_retry(self):
+        """Record that a failed request is retried."""
+        self.retries += 1
+
+    @property
+    def mean_latency(self):
+        """Return the mean latency in seconds, None before any request."""
+        if not self.requests:
+            return None
+        return self.latency_sum / self.requests
+
+    def as_dict(self, now):
+        """Return the counters as state attributes."""
+        histogram = {
+            f"le_{bound:g}": count
+            for bound, count in zip(LATENCY_BUCKETS, self.latency_histogram)
+        }
+        histogram["le_inf"] = self.latency_histogram[-1]
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "endpoints": dict(self.endpoints),
+            "latency_histogram": histogram,
+            "last_latency": (
+                round(self.last_latency, 3) if self.last_latency is not None else None
+            ),
+            "last_success": (
+                self.last_success.isoformat() if self.last_success else None
+            ),
+            "seconds_since_success": (
+                round((now - self.last_success).total_seconds())
+                if self.last_success
+                else None
+            ),
+            "last_error": self.last_error,
+        }